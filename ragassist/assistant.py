@@ -0,0 +1,220 @@
+# ragassist/assistant.py
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .mytypes import LLMResponse, RetrievalHit
+from .index.store_factory import get_vector_store, get_bm25_store, get_chunk_store
+from .retrieval.retriever import Retriever
+from .generation.answer_cache import AnswerCache
+from .generation.context_assembler import ContextAssembler
+from .generation.llm_factory import get_model
+from .generation.query_planner import QueryPlanner
+from .ingestion.embedding_runtime import load_from_cfg
+from .ingestion.manifest import read_index_version
+from .session.chat import ChatSession
+from .session.memory import SessionMemory
+from .tracing import span
+
+
+@dataclass
+class Prepared:
+    """A question after retrieval (and planning, once `plan` is None), ready for or already served by the LLM."""
+    question: str
+    q_emb: np.ndarray
+    raw_ids: List[str]           # chunk IDs retrieved for the raw question: the answer cache key
+    task: str = ""
+    hits: Optional[List[RetrievalHit]] = None
+    cached: Optional[LLMResponse] = None
+    plan: Optional[Future] = None    # reformulation still running; Assistant.plan() waits for it
+
+
+def hits_json(hits: List[RetrievalHit]) -> List[Dict]:
+    return [{"file": h.chunk.file_path, "pos": h.chunk.position, "score": h.score,
+             **({"also_in": h.chunk.meta["also_in"]} if h.chunk.meta.get("also_in") else {})} for h in hits]
+
+
+class Assistant:
+    """Retriever, planner, assembler, LLM and answer cache wired from one config; used by CLI and server."""
+    def __init__(self, cfg: Dict):
+        self.cfg = cfg
+        self.retriever = Retriever(get_vector_store(cfg), get_bm25_store(cfg), get_chunk_store(cfg),
+                                   embed_model=cfg["embedding"]["text_model"],
+                                   alpha_dense=cfg["retrieval"]["alpha_dense"], rrf=cfg["retrieval"]["rrf"],
+                                   encoder=load_from_cfg(cfg["embedding"]["text_model"], cfg))
+        self.llm = get_model(cfg["llm"])
+        self.planner = QueryPlanner.from_cfg(cfg, self.llm, self.retriever)
+        self.assembler = ContextAssembler.from_cfg(cfg)
+        self.cache = AnswerCache.from_cfg(cfg) if cfg.get("answer_cache", {}).get("enabled", True) else None
+        self.system = cfg["prompting"]["system_message"]
+        self.k = cfg["retrieval"]["top_k"]
+        self.index_dir = cfg["project"]["index_dir"]
+        self.index_version = read_index_version(self.index_dir)
+        self._lock = threading.Lock()
+        chat = cfg.get("chat", {})
+        self.same_topic = chat.get("same_topic", 0.8)
+        self.extend_k = chat.get("extend_k", 4)
+        self.extend_tokens = chat.get("extend_tokens", 1500)
+        self.history_tokens = chat.get("history_tokens", 2000)
+
+    def reload_indexes(self):
+        """Reopen the stores (e.g. after another process ingested); the embedding model stays loaded."""
+        r = self.retriever
+        r.vs, r.bm25, r.docs = get_vector_store(self.cfg), get_bm25_store(self.cfg), get_chunk_store(self.cfg)
+
+    def sync_indexes(self):
+        """Reopen the stores if an ingest or watch process has changed the index since they were opened."""
+        version = read_index_version(self.index_dir)
+        if version != self.index_version:
+            with self._lock:
+                if version != self.index_version:
+                    self.reload_indexes()
+                    self.index_version = version
+
+    def warm_up(self):
+        """One dummy encode and index query so the first real request runs at warm-path latency."""
+        self.retriever.retrieve("warm up", k=1)
+
+    def start_many(self, questions: List[str]) -> List[Prepared]:
+        """
+        Retrieval with the raw questions and answer-cache lookup. Reformulations keep running
+        in the background, so callers can show sources before the plan is known.
+        """
+        self.sync_indexes()
+        q_embs = self.retriever.encode(questions)
+        # reformulations (LLM calls) only for questions the cache cannot answer: those with no
+        # similar cached question start now and overlap retrieval, the rest after the full lookup
+        early = [i for i, emb in enumerate(q_embs) if not (self.cache and self.cache.may_hit(emb))]
+        futures: List[Optional[Future]] = [None] * len(questions)
+        for i, fut in zip(early, self.planner.start([questions[i] for i in early])):
+            futures[i] = fut
+        raw_hits = self.retriever.retrieve_many(questions, k=self.k, q_embs=q_embs)
+        out, late = [], []
+        for i, (q, emb, hits) in enumerate(zip(questions, q_embs, raw_hits)):
+            p = Prepared(q, emb, [h.chunk.id for h in hits], task=q, hits=hits)
+            p.cached = self.cache.lookup(emb, p.raw_ids) if self.cache else None
+            if p.cached is None:
+                p.plan = futures[i]
+                if futures[i] is None and i not in early:
+                    late.append(p)
+            out.append(p)
+        for p, fut in zip(late, self.planner.start([p.question for p in late])):
+            p.plan = fut
+        return out
+
+    def plan(self, p: Prepared) -> Prepared:
+        """Wait for the reformulation and re-retrieve if it moved away from the question; no-op once planned."""
+        if p.plan is not None:
+            fut, p.plan = p.plan, None
+            p.task, p.hits = self.planner.finish([p.question], [fut], [p.hits], k=self.k)[0]
+        return p
+
+    def prepare_many(self, questions: List[str]) -> List[Prepared]:
+        """Retrieval, answer-cache lookup and (for misses only) query planning."""
+        out = self.start_many(questions)
+        todo = [p for p in out if p.plan is not None]
+        if todo:
+            # one batched re-retrieval for all rewrites
+            plans = self.planner.finish([p.question for p in todo], [p.plan for p in todo], [p.hits for p in todo], k=self.k)
+            for p, (task, hits) in zip(todo, plans):
+                p.task, p.hits, p.plan = task, hits, None
+        return out
+
+    def prepare(self, question: str) -> Prepared:
+        return self.prepare_many([question])[0]
+
+    def answer(self, p: Prepared) -> LLMResponse:
+        if p.cached is not None:
+            return p.cached
+        self.plan(p)
+        ctx = self.assembler.build(p.question, p.hits)
+        with span("llm.answer"):
+            resp = self.llm.answer(self.system, ctx, p.task, self.cfg["llm"]["max_output_tokens"], self.cfg["llm"]["temperature"])
+        if self.cache and resp.mode != "error":
+            self.cache.store(p.q_emb, p.raw_ids, resp)
+        return resp
+
+    def answer_stream(self, p: Prepared) -> Iterator[str]:
+        if p.cached is not None:
+            yield p.cached.answer
+            return
+        self.plan(p)
+        ctx = self.assembler.build(p.question, p.hits)
+        pieces = []
+        with span("llm.answer_stream"):
+            for piece in self.llm.answer_stream(self.system, ctx, p.task, self.cfg["llm"]["max_output_tokens"],
+                                                self.cfg["llm"]["temperature"]):
+                pieces.append(piece)
+                yield piece
+        if self.cache and pieces:
+            self.cache.store(p.q_emb, p.raw_ids, LLMResponse(answer="".join(pieces).strip(), citations=[],
+                                                             confidence=0.5, mode="answer"))
+
+    def ask(self, question: str) -> Tuple[LLMResponse, List[RetrievalHit]]:
+        p = self.prepare(question)
+        return self.answer(p), p.hits
+
+    def ask_many(self, questions: List[str]) -> List[Tuple[LLMResponse, List[RetrievalHit]]]:
+        return [(self.answer(p), p.hits) for p in self.prepare_many(questions)]
+
+    def new_session(self) -> ChatSession:
+        return ChatSession(SessionMemory(max_turns=64, max_tokens=self.history_tokens, counter=self.assembler.counter))
+
+    def prepare_turn(self, s: ChatSession, question: str) -> str:
+        """
+        Bring the session's context up to date for `question` and return the task. A
+        follow-up close to the previous question keeps the sources already in the prompt
+        and appends only new ones (small k, no planner, no answer cache); anything else
+        starts a fresh context through the normal retrieval path.
+        """
+        self.sync_indexes()
+        q_emb = self.retriever.encode([question])
+        same = s.topic_emb is not None and s.context and float(q_emb[0] @ s.topic_emb) >= self.same_topic
+        s.topic_emb = q_emb[0]
+        if same:
+            known = {h.chunk.id for h in s.hits}
+            hits = [h for h in self.retriever.retrieve_many([question], k=self.extend_k, q_embs=q_emb)[0]
+                    if h.chunk.id not in known]
+            task = question
+            s.reused_turns += 1
+        else:
+            futures = self.planner.start([question])
+            raw = self.retriever.retrieve_many([question], k=self.k, q_embs=q_emb)
+            task, hits = self.planner.finish([question], futures, raw, k=self.k)[0]
+            s.reset_context()
+        # a new topic leaves extend_tokens of the budget free for its follow-ups
+        room = self.assembler.token_budget - s.context_tokens - (0 if same else self.extend_tokens)
+        if hits and room > 0:
+            blocks, used = self.assembler.build_blocks(question, hits, token_budget=room, first_source=s.sources + 1)
+            s.extend_context(blocks, used)
+            s.hits.extend(hits)
+        s.turns += 1
+        return task
+
+    def chat(self, s: ChatSession, question: str) -> Tuple[LLMResponse, List[RetrievalHit]]:
+        """One turn of a chat session; turns of one session run one at a time."""
+        with s.lock:
+            task = self.prepare_turn(s, question)
+            with span("llm.answer"):
+                resp = self.llm.answer(self.system, s.context, task, self.cfg["llm"]["max_output_tokens"],
+                                       self.cfg["llm"]["temperature"], history=s.memory.messages())
+            if resp.mode != "error":
+                s.memory.add("user", question)
+                s.memory.add("assistant", resp.answer)
+            return resp, s.hits
+
+    def chat_stream(self, s: ChatSession, question: str) -> Iterator[str]:
+        with s.lock:
+            task = self.prepare_turn(s, question)
+            pieces = []
+            with span("llm.answer_stream"):
+                for piece in self.llm.answer_stream(self.system, s.context, task, self.cfg["llm"]["max_output_tokens"],
+                                                    self.cfg["llm"]["temperature"], history=s.memory.messages()):
+                    pieces.append(piece)
+                    yield piece
+            if pieces:
+                s.memory.add("user", question)
+                s.memory.add("assistant", "".join(pieces).strip())
@@ -0,0 +1,216 @@
+# ragassist/bench.py
+"""
+Offline benchmark: synthetic corpus -> full ingest pipeline -> retrieval latency and
+recall. Embedding and generation use deterministic stubs, so runs need no models or
+network and two runs of the same settings are directly comparable.
+"""
+import contextlib
+import copy
+import hashlib
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .mytypes import Chunk, LLMResponse
+from .generation.context_assembler import ContextAssembler
+from .generation.llm_base import LLMBase
+from .index.lexical_store import tokenize
+from .index.store_factory import get_vector_store, get_bm25_store, get_chunk_store
+from .ingestion.chunker import Chunker
+from .ingestion.dedup import ChunkDeduper
+from .ingestion.file_loader import FileLoader
+from .ingestion.manifest import IngestManifest, settings_fingerprint
+from .ingestion.pipeline import IngestPipeline
+from .ingestion.preprocess import PdfExtractor
+from .retrieval.retriever import Retriever
+
+
+class HashEmbedder:
+    """Feature-hashed bag of tokens, L2-normalized. Quacks like Embedder and SentenceTransformer."""
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.caches = {}
+
+    def _vec(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for tok in tokenize(text):
+            h = int.from_bytes(hashlib.blake2b(tok.encode(), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if h >> 63 else -1.0
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        return np.stack([self._vec(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_batch(self, chunks: List[Chunk]) -> Dict:
+        return {"ids": [c.id for c in chunks], "embeddings": self.encode([c.text for c in chunks])}
+
+
+class StubLLM(LLMBase):
+    model = "stub"
+
+    def answer(self, system_prompt, retrievals, task, max_tokens, temperature, history=None) -> LLMResponse:
+        return LLMResponse(answer=retrievals[:200], citations=[], confidence=0.0, mode="answer")
+
+
+def _vocab(rng: np.random.Generator, n: int) -> List[str]:
+    syll = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "dra", "ex", "qu", "in", "or", "ul"]
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(syll, size=rng.integers(2, 5))))
+    return sorted(words)
+
+
+def synth_corpus(root: Path, n_text: int, n_code: int, seed: int = 0, pdf_dir: Optional[str] = None):
+    """Zipf-distributed prose, Python modules named from the same vocabulary, and any sample PDFs."""
+    rng = np.random.default_rng(seed)
+    vocab = _vocab(rng, 5000)
+    p = 1.0 / np.arange(1, len(vocab) + 1)
+    p /= p.sum()
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(n_text):
+        paras = [" ".join(rng.choice(vocab, size=rng.integers(40, 200), p=p)) + "."
+                 for _ in range(rng.integers(3, 20))]
+        (root / f"doc_{i:05d}.{'md' if i % 2 else 'txt'}").write_text("\n\n".join(paras))
+    for i in range(n_code):
+        funcs = []
+        for _ in range(rng.integers(3, 15)):
+            a, b, c = rng.choice(vocab, size=3, p=p)
+            body = "\n".join(f"    {w}_{j} = {a}Helper({b}, {j})" for j, w in enumerate(rng.choice(vocab, size=rng.integers(3, 25), p=p)))
+            funcs.append(f"def {a}_{b}({c}):\n    \"\"\"{' '.join(rng.choice(vocab, size=12, p=p))}\"\"\"\n{body}\n    return {c}\n")
+        (root / f"mod_{i:05d}.py").write_text("\n\n".join(funcs))
+    for pdf in sorted(Path(pdf_dir).glob("*.pdf")) if pdf_dir else []:
+        shutil.copy(pdf, root / pdf.name)
+
+
+def _pct(xs: List[float]) -> Dict[str, float]:
+    a = np.asarray(xs) * 1000.0
+    return {"p50_ms": float(np.percentile(a, 50)), "p95_ms": float(np.percentile(a, 95)),
+            "p99_ms": float(np.percentile(a, 99)), "mean_ms": float(a.mean())}
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024   # bytes on macOS, KiB on Linux
+
+
+def _bm25_exact(docs: List[List[str]], query: List[str], k: int, k1: float = 1.2, b: float = 0.75) -> List[int]:
+    """Textbook BM25 over every document; ground truth for the lexical store."""
+    n = len(docs)
+    avgdl = sum(map(len, docs)) / max(1, n)
+    q = set(query)
+    df = {t: 0 for t in q}
+    tfs = []
+    for d in docs:
+        tf = {}
+        for t in d:
+            if t in q:
+                tf[t] = tf.get(t, 0) + 1
+        for t in tf:
+            df[t] += 1
+        tfs.append(tf)
+    scores = np.zeros(n)
+    for i, (d, tf) in enumerate(zip(docs, tfs)):
+        for t, f in tf.items():
+            idf = np.log1p((n - df[t] + 0.5) / (df[t] + 0.5))
+            scores[i] += idf * f * (k1 + 1) / (f + k1 * (1 - b + b * len(d) / avgdl))
+    cand = np.flatnonzero(scores > 0)
+    return list(cand[np.argsort(-scores[cand], kind="stable")][:k])
+
+
+def _recall(found: List[str], exact: List[str]) -> float:
+    return len(set(found) & set(exact)) / len(exact) if exact else 1.0
+
+
+def run_bench(cfg: Dict, n_text: int = 200, n_code: int = 100, n_queries: int = 200, k: int = 8,
+              seed: int = 0, workers: int = 2, pdf_dir: Optional[str] = "test_data", dim: int = 256,
+              work_dir: Optional[str] = None) -> Dict:
+    tmp = Path(work_dir or tempfile.mkdtemp(prefix="ragassist-bench-"))
+    try:
+        cfg = copy.deepcopy(cfg)
+        cfg["project"].update(root_dir=str(tmp / "corpus"), index_dir=str(tmp / "index"))
+        synth_corpus(tmp / "corpus", n_text, n_code, seed=seed, pdf_dir=pdf_dir)
+        report: Dict = {"params": {"n_text": n_text, "n_code": n_code, "n_queries": n_queries, "k": k, "seed": seed,
+                                   "workers": workers, "dim": dim,
+                                   "vector_store": cfg["vector_store"].get("provider", "chroma"),
+                                   "bm25": cfg["bm25"].get("provider", "whoosh") if cfg["bm25"]["enabled"] else None}}
+
+        # -- ingest
+        embedder = HashEmbedder(dim)
+        fl = FileLoader.from_cfg(cfg)
+        vec, bm25, docs = get_vector_store(cfg), get_bm25_store(cfg), get_chunk_store(cfg)
+        manifest = IngestManifest(cfg["project"]["index_dir"], settings_fingerprint(cfg))
+        pdfx = PdfExtractor(cache_dir=str(tmp / "index" / "extract_cache"), workers=cfg["ingestion"].get("pdf_workers"),
+                            pages_per_task=cfg["ingestion"].get("pdf_pages_per_task", 16)) if pdf_dir else None
+        pipe = IngestPipeline(Chunker(cfg), lambda: embedder, vec, bm25, docs, manifest, workers=workers, pdf_extractor=pdfx,
+                              deduper=ChunkDeduper.from_cfg(cfg))
+        t0 = time.perf_counter()
+        with pdfx or contextlib.nullcontext():
+            stats = pipe.run(fl.load_files())
+        wall = time.perf_counter() - t0
+        report["ingest"] = {"wall_s": wall, "errors": pipe.errors, "peak_rss_mb": _peak_rss_mb(), "duplicates": pipe.duplicates,
+                            "stages": {s.name: {"items": s.items, "busy_s": s.busy_s, "per_s": s.rate}
+                                       for s in stats.values()}}
+
+        # -- ground truth over everything that was indexed
+        ids = list(dict.fromkeys(cid for entry in manifest.files.values() for cid in entry["chunk_ids"]))
+        by_id = docs.get_many(ids)
+        ids = [cid for cid in ids if cid in by_id]
+        report["ingest"]["chunks"] = len(ids)
+        if not ids:
+            return report
+        M = embedder.encode([by_id[cid].text for cid in ids])
+        toks = [tokenize(by_id[cid].text) for cid in ids]
+
+        # queries: a few words lifted from random chunks, so most have a clear answer
+        rng = np.random.default_rng(seed + 1)
+        queries = []
+        for i in rng.integers(0, len(ids), size=n_queries):
+            words = by_id[ids[i]].text.split()
+            start = int(rng.integers(0, max(1, len(words) - 6)))
+            queries.append(" ".join(words[start:start + int(rng.integers(2, 7))]))
+
+        # -- latency
+        retriever = Retriever(vec, bm25, docs, embed_model="stub", alpha_dense=cfg["retrieval"]["alpha_dense"],
+                              rrf=cfg["retrieval"]["rrf"], encoder=embedder)
+        assembler, llm = ContextAssembler.from_cfg(cfg), StubLLM()
+        Q = embedder.encode(queries)
+        retriever.retrieve(queries[0], k=k)   # warm up
+        t_dense, t_bm25, t_retrieve, t_ask = [], [], [], []
+        dense_ids, bm25_ids = [], []
+        for q, q_emb in zip(queries, Q):
+            t0 = time.perf_counter()
+            dense_ids.append(vec.query(q_emb, k=k)["ids"][0])
+            t1 = time.perf_counter()
+            bm25_ids.append([h["id"] for h in bm25.search(q, k=k)] if bm25 else [])
+            t2 = time.perf_counter()
+            hits = retriever.retrieve(q, k=k)
+            t3 = time.perf_counter()
+            llm.answer("", assembler.build(q, hits), q, 0, 0.0)
+            t4 = time.perf_counter()
+            t_dense.append(t1 - t0); t_bm25.append(t2 - t1); t_retrieve.append(t3 - t2); t_ask.append(t4 - t2)
+        t0 = time.perf_counter()
+        retriever.retrieve_many(queries, k=k)
+        batch_s = time.perf_counter() - t0
+        report["query"] = {"dense": _pct(t_dense), "bm25": _pct(t_bm25) if bm25 else None,
+                           "retrieve": _pct(t_retrieve), "ask_stub_llm": _pct(t_ask),
+                           "retrieve_many_qps": len(queries) / batch_s if batch_s > 0 else 0.0,
+                           "peak_rss_mb": _peak_rss_mb()}
+
+        # -- recall@k against exact search
+        exact_dense = np.argsort(-(Q @ M.T), axis=1, kind="stable")[:, :k]
+        report["recall"] = {"dense": float(np.mean([_recall(found, [ids[j] for j in exact])
+                                                    for found, exact in zip(dense_ids, exact_dense)]))}
+        if bm25:
+            report["recall"]["bm25"] = float(np.mean([_recall(found, [ids[j] for j in _bm25_exact(toks, tokenize(q), k)])
+                                                      for q, found in zip(queries, bm25_ids)]))
+        return report
+    finally:
+        if work_dir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
@@ -1,81 +1,277 @@
+import contextlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
 import typer, yaml
 from .ingestion.file_loader import FileLoader
-from .ingestion.preprocess import extract_text
+from .ingestion.manifest import IngestManifest, bump_index_version, settings_fingerprint
+from .ingestion.pipeline import IngestPipeline, format_duplicates, format_stats
+from .ingestion.dedup import ChunkDeduper
+from .ingestion.preprocess import PdfExtractor
+from .ingestion.watcher import Watcher
 from .ingestion.chunker import Chunker
 from .ingestion.embedder import Embedder
-from .index.vector_store import VectorStore
-from .index.bm25_store import BM25Store
-from .retrieval.retriever import Retriever
-from .generation.context_assembler import ContextAssembler
-from .generation.llm_factory import get_model
+from .ingestion.embedding_runtime import agreement, load_embedding_model, load_from_cfg, runtime_tag
+from .index.store_factory import get_vector_store, get_bm25_store, get_chunk_store
+from . import tracing
+from .assistant import Assistant
+from .bench import run_bench
+from .daemon import DaemonClient, QueryDaemon, socket_path
 
 app = typer.Typer()
 
 def load_cfg(path: str):
     with open(path) as f: return yaml.safe_load(f)
 
+_PROFILE = typer.Option(False, help="Print the time spent in each instrumented stage.")
+
+def _echo_profile(timings):
+    # nested spans overlap (e.g. retrieve contains encode), so the rows do not add up to the total
+    for name, secs in sorted(timings.items(), key=lambda kv: -kv[1]):
+        typer.echo(f"  {name:<20} {secs * 1000:10.1f} ms", err=True)
+
+def _ingest_parts(cfg):
+    """Manifest, stores, lazy embedder factory, PDF extractor and deduper shared by ingest and watch."""
+    index_dir = Path(cfg["project"]["index_dir"])
+    had_index = index_dir.is_dir() and any(index_dir.iterdir())
+    manifest = IngestManifest(str(index_dir), settings_fingerprint(cfg))
+    vec = get_vector_store(cfg)
+    bm25 = get_bm25_store(cfg)
+    docs = get_chunk_store(cfg)
+    deduper = ChunkDeduper.from_cfg(cfg)
+    if not manifest.usable:
+        # chunks the manifest does not list (older version, other settings) would stay in the stores for good
+        for store in (vec, bm25, docs, deduper):
+            if store is not None:
+                store.clear()
+        manifest.clear()
+        bump_index_version(str(index_dir))
+        if had_index:
+            typer.echo(f"{index_dir} was built by an older version or with other settings: rebuilding it", err=True)
+    # the model is only loaded once some file actually needs embedding
+    emb_cfg = cfg["embedding"]
+    cache_cfg = emb_cfg.get("cache", {})
+    cache_dir = cache_cfg.get("dir") or str(Path(cfg["project"]["index_dir"]) / "embedding_cache")
+    make_embedder = lambda: Embedder(emb_cfg["text_model"], emb_cfg["code_model"],
+                                     device=emb_cfg["device"],
+                                     batch_size=emb_cfg.get("batch_size", 64),
+                                     cache_dir=cache_dir if cache_cfg.get("enabled", True) else None,
+                                     cache_max_mb=cache_cfg.get("max_mb", 1024),
+                                     runtime=emb_cfg.get("runtime", "torch"),
+                                     artifacts_dir=emb_cfg.get("runtime_dir") or cfg["project"]["index_dir"],
+                                     quantization=emb_cfg.get("quantization"),
+                                     runtime_tag=runtime_tag(emb_cfg))
+
+    ing = cfg["ingestion"]
+    pdfx = PdfExtractor(cache_dir=str(Path(cfg["project"]["index_dir"]) / "extract_cache"),
+                        workers=ing.get("pdf_workers"), pages_per_task=ing.get("pdf_pages_per_task", 16))
+    return manifest, vec, bm25, docs, make_embedder, pdfx, deduper
+
 @app.command()
-def ingest(config: str = "configs/default.yaml"):
+def ingest(config: str = "configs/default.yaml", workers: int = 2, profile: bool = _PROFILE):
     cfg = load_cfg(config)
-    fl = FileLoader(cfg["project"]["root_dir"],
-                    cfg["ingestion"]["include_globs"],
-                    cfg["ingestion"]["exclude_globs"],
-                    cfg["project"]["id"])
-    files = fl.load_files()
-    ch = Chunker(cfg)
-
-    all_chunks = []
-    for fd in files:
-        text = extract_text(fd.path, fd.type)
-        all_chunks.extend(ch.chunk(text, fd.path, fd.type))
-
-    emb = Embedder(cfg["embedding"]["text_model"], cfg["embedding"]["code_model"], device=cfg["embedding"]["device"])
-    vec = VectorStore(cfg["vector_store"]["collection"], cfg["project"]["index_dir"])
-    bm25 = BM25Store(cfg["project"]["index_dir"]) if cfg["bm25"]["enabled"] else None
-
-    # batch for memory, simplify:
-    batch = 256
-    for i in range(0, len(all_chunks), batch):
-        chunk_batch = all_chunks[i:i+batch]
-        out = emb.embed_batch(chunk_batch)
-        vec.add(chunk_batch, out["embeddings"])
-        if bm25: bm25.add(chunk_batch)
-
-    typer.echo(f"Ingested {len(all_chunks)} chunks.")
+    tracing.enable(profile)
+    fl = FileLoader.from_cfg(cfg)
+    manifest, vec, bm25, docs, make_embedder, pdfx, deduper = _ingest_parts(cfg)
+    pipe = IngestPipeline(Chunker(cfg), make_embedder, vec, bm25, docs, manifest,
+                          workers=workers, pdf_extractor=pdfx, progress=lambda st: typer.echo(format_stats(st), err=True),
+                          deduper=deduper)
+    t0 = time.perf_counter()
+    with pdfx:
+        stats = pipe.run(fl.load_files())
+    for err in pipe.errors:
+        typer.echo(f"skipped {err}", err=True)
+    typer.echo(format_stats(stats))
+    if pipe.embedder and pipe.embedder.caches:
+        typer.echo(f"embedding cache: {pipe.embedder.cache_stats()}")
+    if deduper:
+        typer.echo(format_duplicates(pipe.duplicates))
+    typer.echo(f"Ingested {stats['write'].items} chunks from {stats['chunk'].items} changed files; "
+               f"removed {pipe.removed_chunks} stale chunks ({pipe.unchanged_files} files unchanged) "
+               f"in {time.perf_counter() - t0:.1f}s.")
+    if profile:
+        # busy time summed over worker threads
+        _echo_profile({name: row["total_s"] for name, row in tracing.summary().items()})
 
 @app.command()
-def ask(q: str, config: str = "configs/default.yaml"):
+def watch(config: str = "configs/default.yaml", workers: int = 2,
+          debounce: float = typer.Option(1.0, help="Seconds without edits before a batch is indexed."),
+          poll: float = typer.Option(2.0, help="Scan interval when polling."),
+          backend: str = typer.Option("auto", help='"auto" (inotify etc. via watchdog if installed) | "poll".')):
+    """Keep the index current: re-process only the files touched since the last batch."""
     cfg = load_cfg(config)
-    vec = VectorStore(cfg["vector_store"]["collection"], cfg["project"]["index_dir"])
-    bm25 = BM25Store(cfg["project"]["index_dir"]) if cfg["bm25"]["enabled"] else None
-    retr = Retriever(vec, bm25, embed_model=cfg["embedding"]["text_model"],
-                     alpha_dense=cfg["retrieval"]["alpha_dense"], rrf=cfg["retrieval"]["rrf"])
-    hits = retr.retrieve(q, k=cfg["retrieval"]["top_k"])
-    ctx = ContextAssembler().build(q, hits)
-    system = cfg["prompting"]["system_message"]
-    llm = get_model(cfg["llm"])
-    resp = llm.generate(system, ctx, q, cfg["llm"]["max_output_tokens"], cfg["llm"]["temperature"])
-    print(resp.answer)
+    fl = FileLoader.from_cfg(cfg)
+    manifest, vec, bm25, docs, make_embedder, pdfx, deduper = _ingest_parts(cfg)
+    embedder = []
+
+    def shared_embedder():
+        # loaded by the first batch that needs it, then kept for the session
+        if not embedder:
+            embedder.append(make_embedder())
+        return embedder[0]
+
+    def run(files, removed=None):
+        # small frequent batches: leave segment merging/compaction to full ingests
+        pipe = IngestPipeline(Chunker(cfg), shared_embedder, vec, bm25, docs, manifest,
+                              workers=workers, pdf_extractor=pdfx, optimize=False, deduper=deduper)
+        t0 = time.perf_counter()
+        pipe.run(files, removed=removed)
+        for err in pipe.errors:
+            typer.echo(f"skipped {err}", err=True)
+        if pipe.stats["write"].items or pipe.removed_chunks:
+            typer.echo(f"{time.strftime('%H:%M:%S')} {pipe.stats['chunk'].items} files re-indexed: "
+                       f"+{pipe.stats['write'].items} / -{pipe.removed_chunks} chunks "
+                       f"in {time.perf_counter() - t0:.2f}s")
+
+    retry = set()
+
+    def on_batch(paths):
+        nonlocal manifest
+        paths = watcher.expand(sorted(retry.union(paths)), manifest.files)
+        retry.clear()
+        fds = [fd for fd in map(fl.describe, paths) if fd]
+        kept = {fd.path for fd in fds}
+        try:
+            run(fds, removed=[p for p in paths if p not in kept and p in manifest.files])
+        except Exception as exc:
+            # keep watching: back to the last saved manifest, and these paths go again with the next batch
+            shown = ", ".join(paths[:5]) + (f" (+{len(paths) - 5} more)" if len(paths) > 5 else "")
+            typer.echo(f"{time.strftime('%H:%M:%S')} batch failed, will retry {shown}: {exc!r}", err=True)
+            retry.update(paths)
+            manifest = IngestManifest(cfg["project"]["index_dir"], manifest.fingerprint)
+
+    stop = threading.Event()
+    watcher = Watcher(fl, debounce_s=debounce, poll_s=poll, backend=backend)
+    with pdfx:
+        run(fl.load_files())    # catch up on edits made while nothing was watching
+        typer.echo(f"watching {fl.root} ({watcher.start(stop)}); Ctrl-C to stop")
+        try:
+            watcher.run(on_batch, stop)
+        except KeyboardInterrupt:
+            stop.set()
+
+def _connect(cfg, local: bool):
+    # a running daemon answers at warm-path latency; otherwise load everything in-process
+    return None if local else DaemonClient.connect(socket_path(cfg))
 
 @app.command()
-def chat(config: str = "configs/default.yaml"):
+def ask(q: str = typer.Argument(None), config: str = "configs/default.yaml",
+        file: str = typer.Option(None, help="Text file with one question per line; answered as a batch."),
+        local: bool = typer.Option(False, help="Answer in-process even if a daemon is running."),
+        profile: bool = _PROFILE):
     cfg = load_cfg(config)
-    vec = VectorStore(cfg["vector_store"]["collection"], cfg["project"]["index_dir"])
-    bm25 = BM25Store(cfg["project"]["index_dir"]) if cfg["bm25"]["enabled"] else None
-    retr = Retriever(vec, bm25, embed_model=cfg["embedding"]["text_model"],
-                     alpha_dense=cfg["retrieval"]["alpha_dense"], rrf=cfg["retrieval"]["rrf"])
-    system = cfg["prompting"]["system_message"]
-    llm = get_model(cfg["llm"])
+    queries = [q] if q else []
+    if file:
+        with open(file) as f:
+            queries += [line.strip() for line in f if line.strip()]
+    if not queries:
+        raise typer.BadParameter("pass a question or --file")
+    client = _connect(cfg, local)
+    timings = {}
+    if client is not None:
+        with client:
+            answers = [r["answer"] for r in client.ask_many(queries, timings if profile else None)]
+    else:
+        assistant = Assistant(cfg)
+        with tracing.collect() if profile else contextlib.nullcontext({}) as timings:
+            answers = [resp.answer for resp, hits in assistant.ask_many(queries)]
+    for query, answer in zip(queries, answers):
+        if len(queries) > 1:
+            print(f"### {query}")
+        print(answer)
+    if profile:
+        _echo_profile(timings)
+
+@app.command()
+def chat(config: str = "configs/default.yaml",
+         local: bool = typer.Option(False, help="Answer in-process even if a daemon is running."),
+         profile: bool = _PROFILE):
+    """Multi-turn: follow-ups see the conversation so far and reuse the sources already retrieved."""
+    cfg = load_cfg(config)
+    client = _connect(cfg, local)
+    assistant = Assistant(cfg) if client is None else None
+    session = assistant.new_session() if client is None else None
+    session_id = None
 
     while(True):
         q = input("Task: ")
         if q == "\\bye":
             print("exiting...")
             break
-        hits = retr.retrieve(q, k=cfg["retrieval"]["top_k"])
-        ctx = ContextAssembler().build(q, hits)
-        resp = llm.generate(system, ctx, q, cfg["llm"]["max_output_tokens"], cfg["llm"]["temperature"])
-        print(resp.answer)
+        timings = {}
+        if client is not None:
+            reply = client.chat(session_id, q, timings if profile else None)
+            session_id = reply["session"]
+            print(reply["answer"])
+        else:
+            with tracing.collect() if profile else contextlib.nullcontext({}) as timings:
+                resp, hits = assistant.chat(session, q)
+            print(resp.answer)
+        if profile:
+            _echo_profile(timings)
+    if client is not None:
+        if session_id:
+            client.call({"op": "end_chat", "session": session_id})
+        client.close()
+
+@app.command()
+def daemon(config: str = "configs/default.yaml", stop: bool = typer.Option(False, help="Stop a running daemon.")):
+    """Keep models and indexes resident; `ask` and `chat` use it automatically over a Unix socket."""
+    cfg = load_cfg(config)
+    if stop:
+        client = DaemonClient.connect(socket_path(cfg))
+        if client is None:
+            typer.echo("no daemon running")
+            raise typer.Exit(1)
+        with client:
+            client.call({"op": "shutdown"})
+        return
+    d = QueryDaemon(cfg)
+    typer.echo(f"ragassist daemon ready in {d.ready_s:.1f}s, listening on {d.path}")
+    d.serve_forever()
+
+@app.command()
+def bench(config: str = "configs/default.yaml", text_files: int = 200, code_files: int = 100, queries: int = 200,
+          k: int = 8, seed: int = 0, workers: int = 2,
+          pdf_dir: str = typer.Option("test_data", help="Sample PDFs copied into the corpus; '' for none."),
+          vector_store: str = typer.Option(None, help="Override vector_store.provider."),
+          bm25: str = typer.Option(None, help="Override bm25.provider."),
+          out: str = typer.Option(None, help="Write the JSON report here instead of stdout.")):
+    """Ingest throughput, query latency and recall@k on a synthetic corpus with stub embedder and LLM."""
+    cfg = load_cfg(config)
+    if vector_store:
+        cfg["vector_store"]["provider"] = vector_store
+    if bm25:
+        cfg["bm25"]["provider"] = bm25
+    report = run_bench(cfg, n_text=text_files, n_code=code_files, n_queries=queries, k=k, seed=seed,
+                       workers=workers, pdf_dir=pdf_dir or None)
+    text = json.dumps(report, indent=2)
+    if out:
+        Path(out).write_text(text)
+    else:
+        print(text)
+
+@app.command("embed-check")
+def embed_check(config: str = "configs/default.yaml", samples: int = 256,
+                min_cosine: float = typer.Option(0.99, help="Fail when the mean cosine to the reference is lower.")):
+    """Compare the configured embedding runtime with the reference PyTorch model on indexed chunks."""
+    cfg = load_cfg(config)
+    ids = [cid for entry in IngestManifest(cfg["project"]["index_dir"]).files.values() for cid in entry["chunk_ids"]]
+    if not ids:
+        raise typer.BadParameter("the index is empty; run ingest first")
+    rng = random.Random(0)
+    chunks = get_chunk_store(cfg).get_many(rng.sample(ids, min(samples, len(ids))))
+    texts = [c.text for c in chunks.values()]
+    name = cfg["embedding"]["text_model"]
+    device = None if cfg["embedding"]["device"] == "auto" else cfg["embedding"]["device"]
+    report = agreement(load_embedding_model(name, "torch", device=device), load_from_cfg(name, cfg),
+                       texts, batch_size=cfg["embedding"].get("batch_size", 64))
+    report = {"model": name, "runtime": runtime_tag(cfg["embedding"]) or "torch", **report}
+    print(json.dumps(report, indent=2))
+    if report["cosine_mean"] < min_cosine:
+        raise typer.Exit(1)
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,150 @@
+# ragassist/daemon.py
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import tracing
+from .assistant import Assistant, hits_json
+from .session.chat import SessionStore
+
+
+def socket_path(cfg: Dict) -> str:
+    return cfg.get("daemon", {}).get("socket") or str(Path(cfg["project"]["index_dir"]) / "ragassist.sock")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one JSON request per line, one JSON reply per line; a client may keep the connection for many requests
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.daemon.handle(json.loads(line))
+            except Exception as exc:
+                reply = {"error": f"{type(exc).__name__}: {exc}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class QueryDaemon:
+    """
+    Keeps the Assistant (embedding model, indexes, LLM client) resident and answers
+    CLI questions over a Unix domain socket. The Assistant reopens its stores when an
+    ingest moves the index version stamp, so answers never come from a stale index.
+    """
+    def __init__(self, cfg: Dict, path: Optional[str] = None):
+        self.cfg = cfg
+        self.path = path or socket_path(cfg)
+        tracing.enable(cfg.get("tracing", {}).get("enabled", True))
+        t0 = time.perf_counter()
+        self.assistant = Assistant(cfg)
+        self.assistant.warm_up()
+        self.sessions = SessionStore.from_cfg(cfg, self.assistant.new_session)
+        self.ready_s = time.perf_counter() - t0
+        self._server: Optional[_Server] = None
+
+    def handle(self, req: Dict) -> Dict:
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "ask":
+            with tracing.collect() if req.get("timings") else contextlib.nullcontext({}) as timings:
+                results = self.assistant.ask_many(req["queries"])
+            reply = {"results": [{"answer": resp.answer, "mode": resp.mode, "hits": hits_json(hits)}
+                                 for resp, hits in results]}
+            if req.get("timings"):
+                reply["timings"] = timings
+            return reply
+        if op == "chat":
+            s = self.sessions.get(req.get("session"))
+            with tracing.collect() if req.get("timings") else contextlib.nullcontext({}) as timings:
+                resp, hits = self.assistant.chat(s, req["query"])
+            reply = {"session": s.id, "answer": resp.answer, "mode": resp.mode, "hits": hits_json(hits), "stats": s.stats()}
+            if req.get("timings"):
+                reply["timings"] = timings
+            return reply
+        if op == "end_chat":
+            return {"ok": self.sessions.drop(req["session"])}
+        if op == "stats":
+            return {"cache": self.assistant.cache.stats() if self.assistant.cache else {}, "index_version": self.assistant.index_version,
+                    "sessions": len(self.sessions), "spans": tracing.summary(),
+                    "llm": self.assistant.llm.stats() if hasattr(self.assistant.llm, "stats") else {}}
+        if op == "shutdown":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"ok": True}
+        raise ValueError(f"unknown op {op!r}")
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            if DaemonClient.connect(self.path) is not None:
+                raise RuntimeError(f"a daemon is already listening on {self.path}")
+            os.unlink(self.path)  # left behind by a daemon that did not exit cleanly
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._server = _Server(self.path, _Handler)
+        self._server.daemon = self
+        os.chmod(self.path, 0o600)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class DaemonClient:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.rfile = sock.makefile("rb")
+
+    @classmethod
+    def connect(cls, path: str) -> Optional["DaemonClient"]:
+        """None when no daemon is listening on `path`; callers then work in-process."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError:     # missing or stale socket, no permission, path too long, ...
+            sock.close()
+            return None
+        return cls(sock)
+
+    def call(self, req: Dict) -> Dict:
+        self.sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def ask_many(self, queries: List[str], timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Fills `timings` (span -> seconds spent in the daemon) when given."""
+        reply = self.call({"op": "ask", "queries": queries, "timings": timings is not None})
+        if timings is not None:
+            timings.update(reply.get("timings", {}))
+        return reply["results"]
+
+    def chat(self, session: Optional[str], query: str, timings: Optional[Dict[str, float]] = None) -> Dict:
+        """One turn; pass back the returned "session" to continue the conversation."""
+        reply = self.call({"op": "chat", "session": session, "query": query, "timings": timings is not None})
+        if timings is not None:
+            timings.update(reply.get("timings", {}))
+        return reply
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
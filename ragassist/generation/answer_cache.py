@@ -0,0 +1,109 @@
+# ragassist/generation/answer_cache.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from ..ingestion.manifest import read_index_version
+from ..mytypes import LLMResponse
+
+
+@dataclass
+class _Entry:
+    emb: np.ndarray
+    chunk_ids: FrozenSet[str]
+    resp: LLMResponse
+    created: float
+
+
+class AnswerCache:
+    """
+    In-memory cache of LLM answers. A question hits when an earlier one retrieved exactly
+    the same chunk IDs, its embedding is within `threshold` cosine similarity, the entry is
+    younger than `ttl_s`, and the index version stamp has not moved since it was stored
+    (any ingest that changes the index clears the cache).
+    """
+    def __init__(self, index_dir: str, threshold: float = 0.95, ttl_s: float = 3600, max_entries: int = 1024):
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_ids: Dict[FrozenSet[str], List[int]] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._version = read_index_version(index_dir)
+
+    @classmethod
+    def from_cfg(cls, cfg: Dict):
+        ac = cfg.get("answer_cache", {})
+        return cls(cfg["project"]["index_dir"], threshold=ac.get("similarity", 0.95),
+                   ttl_s=ac.get("ttl_s", 3600), max_entries=ac.get("max_entries", 1024))
+
+    def _sync_version(self):
+        version = read_index_version(self.index_dir)
+        if version != self._version:
+            self._entries.clear()
+            self._by_ids.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def _drop(self, eid: int):
+        e = self._entries.pop(eid)
+        ids = self._by_ids[e.chunk_ids]
+        ids.remove(eid)
+        if not ids:
+            del self._by_ids[e.chunk_ids]
+
+    def lookup(self, q_emb: np.ndarray, chunk_ids: List[str]) -> Optional[LLMResponse]:
+        key = frozenset(chunk_ids)
+        now = time.time()
+        with self._lock:
+            self._sync_version()
+            best, best_sim = None, self.threshold
+            for eid in list(self._by_ids.get(key, ())):
+                e = self._entries[eid]
+                if now - e.created > self.ttl_s:
+                    self._drop(eid)
+                    continue
+                sim = float(np.dot(e.emb, q_emb))
+                if sim >= best_sim:
+                    best, best_sim = eid, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best].resp
+
+    def may_hit(self, q_emb: np.ndarray) -> bool:
+        """Cheap pre-check before retrieval: some live entry is similar enough, whatever its chunk IDs."""
+        now = time.time()
+        with self._lock:
+            self._sync_version()
+            return any(now - e.created <= self.ttl_s and float(np.dot(e.emb, q_emb)) >= self.threshold
+                       for e in self._entries.values())
+
+    def store(self, q_emb: np.ndarray, chunk_ids: List[str], resp: LLMResponse):
+        if resp.mode == "error":
+            return
+        key = frozenset(chunk_ids)
+        with self._lock:
+            self._sync_version()
+            eid = next(self._seq)
+            self._entries[eid] = _Entry(np.asarray(q_emb, dtype=np.float32), key, resp, time.time())
+            self._by_ids.setdefault(key, []).append(eid)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries), "invalidations": self.invalidations}
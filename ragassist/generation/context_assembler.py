@@ -1,11 +1,117 @@
-from typing import List
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from ..mytypes import RetrievalHit
+from ..tracing import traced
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens. Uses a HuggingFace `tokenizers` tokenizer (Rust, fast) when one
+    is configured, otherwise ~chars/4, which is close for Gemini and Llama-family BPEs.
+    """
+    def __init__(self, tokenizer=None, chars_per_token: float = 4.0):
+        self.tok = tokenizer
+        self.cpt = chars_per_token
+
+    def count(self, text: str) -> int:
+        if self.tok is not None:
+            return len(self.tok.encode(text, add_special_tokens=False).ids)
+        return int(len(text) / self.cpt) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.tok is not None:
+            offsets = self.tok.encode(text, add_special_tokens=False).offsets
+            return text if len(offsets) <= max_tokens else text[:offsets[max_tokens - 1][1]]
+        return text[:int(max_tokens * self.cpt)]
+
+
+def get_token_counter(llm_cfg: Dict) -> TokenCounter:
+    """llm_cfg['tokenizer'] may name a HF hub tokenizer or a tokenizer.json path."""
+    name = llm_cfg.get("tokenizer")
+    if name:
+        try:
+            from tokenizers import Tokenizer  # optional dependency
+            tok = Tokenizer.from_file(name) if name.endswith(".json") else Tokenizer.from_pretrained(name)
+            return TokenCounter(tok)
+        except Exception as exc:
+            print(f"Tokenizer {name} unavailable ({exc}); estimating tokens from length.")
+    return TokenCounter()
+
+
+@dataclass
+class _Span:
+    file_path: str
+    type: str
+    position: int
+    units: List[str]     # words for text chunks, lines for code chunks (what positions count)
+    score: float
+
+    @property
+    def end(self) -> int:
+        return self.position + len(self.units)
+
+    def text(self) -> str:
+        return ("\n" if self.type == "code" else " ").join(self.units)
+
+
+def _units(h: RetrievalHit) -> List[str]:
+    return h.chunk.text.split("\n") if h.chunk.type == "code" else h.chunk.text.split()
+
 
 class ContextAssembler:
-    def build(self, query: str, hits: List[RetrievalHit], token_budget: int = 6000) -> str:
-        # naive budget: just join with file markers
+    def __init__(self, counter: Optional[TokenCounter] = None, token_budget: int = 6000):
+        self.counter = counter or TokenCounter()
+        self.token_budget = token_budget
+
+    @classmethod
+    def from_cfg(cls, cfg: Dict):
+        return cls(get_token_counter(cfg["llm"]), cfg["prompting"].get("context_tokens", 6000))
+
+    def merge(self, hits: List[RetrievalHit]) -> List[_Span]:
+        """
+        Collapse hits that overlap or touch in the same file into one span, dropping the
+        overlap the chunker repeats between neighbours. Spans keep their best hit's score.
+        """
+        groups: Dict[tuple, List[RetrievalHit]] = {}
+        for h in hits:
+            groups.setdefault((h.chunk.file_path, h.chunk.type), []).append(h)
+        spans: List[_Span] = []
+        for (fpath, ctype), group in groups.items():
+            group.sort(key=lambda h: h.chunk.position)
+            cur: Optional[_Span] = None
+            for h in group:
+                units = _units(h)
+                if cur is not None and h.chunk.position <= cur.end:
+                    cur.units.extend(units[cur.end - h.chunk.position:])
+                    cur.score = max(cur.score, h.score)
+                    continue
+                cur = _Span(fpath, ctype, h.chunk.position, units, h.score)
+                spans.append(cur)
+        spans.sort(key=lambda s: s.score, reverse=True)
+        return spans
+
+    def build(self, query: str, hits: List[RetrievalHit], token_budget: Optional[int] = None) -> str:
+        return "\n\n".join(self.build_blocks(query, hits, token_budget)[0])
+
+    @traced("assemble")
+    def build_blocks(self, query: str, hits: List[RetrievalHit], token_budget: Optional[int] = None,
+                     first_source: int = 1) -> Tuple[List[str], int]:
+        """Source blocks numbered from `first_source`, and the tokens they use."""
+        # best spans first, each costed with its header; what does not fit is truncated or dropped
+        budget = total = self.token_budget if token_budget is None else token_budget
         blocks = []
-        for i, h in enumerate(hits, 1):
-            header = f"[Source {i}] {h.chunk.file_path} @ {h.chunk.position}\n"
-            blocks.append(header + h.chunk.text.strip())
-        return "\n\n".join(blocks)
+        for span in self.merge(hits):
+            header = f"[Source {first_source + len(blocks)}] {span.file_path} @ {span.position}\n"
+            body = span.text().strip()
+            cost = self.counter.count(header) + self.counter.count(body) + 1
+            if cost > budget:
+                room = budget - self.counter.count(header) - 1
+                if room < 64:
+                    continue
+                body = self.counter.truncate(body, room)
+                cost = budget
+            blocks.append(header + body)
+            budget -= cost
+        return blocks, total - budget
@@ -1,5 +1,30 @@
+from typing import Dict, Iterator, List, Optional
 from ..mytypes import LLMResponse
 
+History = Optional[List[Dict]]     # prior chat turns, [{"role": "user"|"assistant", "content": ...}]
+
 class LLMBase:
-    def generate(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float) -> LLMResponse:
+    def generate(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> LLMResponse:
+        """Reformulate the question, then answer it from the retrievals."""
+        return self.answer(system_prompt, retrievals, self.reformulate(user_prompt), max_tokens, temperature)
+
+    def generate_stream(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        """Yield the answer in pieces as the backend produces them."""
+        yield from self.answer_stream(system_prompt, retrievals, self.reformulate(user_prompt), max_tokens, temperature)
+
+    def reformulate(self, user_prompt: str) -> str:
+        return user_prompt
+
+    def answer(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+               history: History = None) -> LLMResponse:
+        """
+        Single answer call for an already planned task (see QueryPlanner). With `history`
+        (a chat session) the context goes into the system message so the prompt prefix
+        stays identical from turn to turn and the backend can reuse its cache.
+        """
         raise NotImplementedError
+
+    def answer_stream(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+                      history: History = None) -> Iterator[str]:
+        # default: one piece
+        yield self.answer(system_prompt, retrievals, task, max_tokens, temperature, history=history).answer
@@ -1,6 +1,4 @@
 from typing import Dict
-from .llm_ollama import LLMOllama
-from .llm_gemini import LLMGemini
 
 
 def get_model(llm_cfg: Dict):
@@ -10,11 +8,20 @@ def get_model(llm_cfg: Dict):
     """
     backend = llm_cfg.get("backend", "ollama").lower()
     model = llm_cfg.get("model")
+    timeout = llm_cfg.get("request_timeout_s")
+    limit = llm_cfg.get("max_in_flight")
 
-    if backend == "ollama":
-        return LLMOllama(model)
+    # backends import their client SDKs; only load the one in use
     if backend in ("gemini", "google", "google-gemini"):
-        return LLMGemini(model)
+        from .llm_gemini import LLMGemini
+        llm = LLMGemini(model, timeout=timeout)
+    else:
+        # default: ollama
+        from .llm_ollama import LLMOllama
+        llm = LLMOllama(model, keep_alive=llm_cfg.get("keep_alive"), timeout=timeout, max_connections=limit)
 
-    # default fallback
-    return LLMOllama(model)
+    if not limit:
+        return llm
+    from .llm_limiter import LimitedLLM
+    return LimitedLLM(llm, max_in_flight=limit, queue_timeout_s=llm_cfg.get("queue_timeout_s", 60),
+                      coalesce=llm_cfg.get("coalesce", True))
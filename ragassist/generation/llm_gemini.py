@@ -4,23 +4,54 @@ try:
 except Exception:  # pragma: no cover - optional dependency
     genai = None
 
+from typing import Iterator, Optional
 from ..mytypes import LLMResponse
-from .llm_base import LLMBase
+from .llm_base import History, LLMBase
 
 
 class LLMGemini(LLMBase):
-    def __init__(self, model: str):
+    def __init__(self, model: str, timeout: Optional[float] = None):
         self.model = model
         if genai is not None:
             # Typical Gemini clients provide a Client or direct API; adapt as needed
             try:
-                self.client = genai.Client()
+                http = google_types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
+                self.client = genai.Client(http_options=http)
             except Exception:
                 # fallback to module-level client factory if different
                 self.client = getattr(genai, "client", None)
         else:
             self.client = None
 
+    def reformulate(self, user_prompt: str) -> str:
+        # Build messages similarly to LLMOllama for compatibility
+        sp = """you are an assistant to an AI. Your task is to analyze user's input \
+             and reformulate into clear and concise request for LLM ingestion.
+              The reformulated request will be used to to compile the answer based on provided context from vector store retrievals."""
+        config = google_types.GenerateContentConfig( temperature=0.0, system_instruction=sp)
+        result = self.client.models.generate_content(
+            model=self.model,
+            config=config,
+            contents=user_prompt
+        )
+        reform = result.candidates[0].content.parts[-1].text
+        print(f"Reformulated question: {reform}")
+        return reform
+
+    def _answer_args(self, system_prompt: str, retrievals: str, user_prompt: str, temperature: float,
+                     history: History = None):
+        if history is not None:
+            contents = [google_types.Content(role="model" if m["role"] == "assistant" else "user",
+                                             parts=[google_types.Part(text=m["content"])]) for m in history]
+            contents.append(google_types.Content(role="user", parts=[google_types.Part(text=f"[Task]: {user_prompt}")]))
+            return dict(model=self.model,
+                        config=google_types.GenerateContentConfig(temperature=temperature,
+                                                                  system_instruction=f"{system_prompt}\n\ncontext:\n{retrievals}"),
+                        contents=contents)
+        return dict(model=self.model,
+                    config=google_types.GenerateContentConfig( temperature=temperature, system_instruction=system_prompt),
+                    contents=[f"context:\n{retrievals}\n\n [Task]: {user_prompt}"])
+
     def generate(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> LLMResponse:
         prompt = f"{system_prompt}\n\n[User Question]\n{user_prompt}"
         print(f"User prompt to LLMGemini: {user_prompt}")
@@ -30,28 +61,21 @@ class LLMGemini(LLMBase):
             print("LLMGemini client not initialized.")
             return LLMResponse(answer="", citations=[], confidence=0.0, mode="error")
 
-        # Build messages similarly to LLMOllama for compatibility
-        sp = """you are an assistant to an AI. Your task is to analyze user's input \
-             and reformulate into clear and concise request for LLM ingestion.
-              The reformulated request will be used to to compile the answer based on provided context from vector store retrievals."""
-
         try:
-            config = google_types.GenerateContentConfig( temperature=0.0, system_instruction=sp)
-            result = self.client.models.generate_content(
-                model=self.model,
-                config=config,
-                contents=user_prompt
-            )
-            reform = result.candidates[0].content.parts[-1].text
-
-            print(f"Reformulated question: {reform}")
+            self.reformulate(user_prompt)
+        except Exception as exc:
+            print(f"LLMGemini error: {exc}")
+            return LLMResponse(answer="", citations=[], confidence=0.0, mode="error")
+        return self.answer(system_prompt, retrievals, user_prompt, max_tokens, temperature)
 
+    def answer(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+               history: History = None) -> LLMResponse:
+        if self.client is None:
+            print("LLMGemini client not initialized.")
+            return LLMResponse(answer="", citations=[], confidence=0.0, mode="error")
+        try:
             # Now call the model with system prompt + context
-            result2 = self.client.models.generate_content(
-                model=self.model,
-                config=google_types.GenerateContentConfig( temperature=temperature, system_instruction=system_prompt),
-                contents=[f"context:\n{retrievals}\n\n [Task]: {user_prompt}"]
-            )
+            result2 = self.client.models.generate_content(**self._answer_args(system_prompt, retrievals, task, temperature, history))
             text = result2.candidates[0].content.parts[-1].text.strip()
             print(text)
             return LLMResponse(answer=text, citations=[], confidence=0.5, mode="answer")
@@ -59,3 +83,26 @@ class LLMGemini(LLMBase):
         except Exception as exc:
             print(f"LLMGemini error: {exc}")
             return LLMResponse(answer="", citations=[], confidence=0.0, mode="error")
+
+    def generate_stream(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        if self.client is None:
+            print("LLMGemini client not initialized.")
+            return
+        try:
+            self.reformulate(user_prompt)
+        except Exception as exc:
+            print(f"LLMGemini error: {exc}")
+            return
+        yield from self.answer_stream(system_prompt, retrievals, user_prompt, max_tokens, temperature)
+
+    def answer_stream(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+                      history: History = None) -> Iterator[str]:
+        if self.client is None:
+            print("LLMGemini client not initialized.")
+            return
+        try:
+            for part in self.client.models.generate_content_stream(**self._answer_args(system_prompt, retrievals, task, temperature, history)):
+                if part.text:
+                    yield part.text
+        except Exception as exc:
+            print(f"LLMGemini error: {exc}")
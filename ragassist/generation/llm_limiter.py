@@ -0,0 +1,151 @@
+# ragassist/generation/llm_limiter.py
+"""
+Admission control in front of an LLM backend. At most max_in_flight calls reach the
+backend at once; the rest wait in arrival order for up to queue_timeout_s. Identical
+concurrent answer/reformulate calls (same prompt, context, history and parameters)
+share one generation. Streams hold a slot for their whole length and are not shared.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+import numpy as np
+
+from ..mytypes import LLMResponse
+from ..tracing import span
+from .llm_base import History, LLMBase
+
+
+class LLMBusy(TimeoutError):
+    """No backend slot became free within the queue timeout."""
+
+
+def _key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8", "replace")).hexdigest()
+
+
+class LimitedLLM(LLMBase):
+    def __init__(self, inner: LLMBase, max_in_flight: int = 4, queue_timeout_s: float = 60.0, coalesce: bool = True):
+        self.inner = inner
+        self.model = getattr(inner, "model", "")
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_timeout_s = queue_timeout_s
+        self.coalesce = coalesce
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: "deque[threading.Event]" = deque()
+        self._flights: Dict[str, Future] = {}
+        self._waits: "deque[float]" = deque(maxlen=1024)      # recent queue waits (s)
+        self.counts = Counter()     # calls, coalesced, timeouts, errors
+
+    # -- fair slots: FIFO hand-off, a released slot goes straight to the oldest waiter
+    def _acquire(self) -> bool:
+        t0 = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                ev = None
+            else:
+                ev = threading.Event()
+                self._waiters.append(ev)
+        if ev is not None and not ev.wait(self.queue_timeout_s):
+            with self._lock:
+                if not ev.is_set():
+                    self._waiters.remove(ev)
+                    self.counts["timeouts"] += 1
+                    return False
+                # granted just as the wait ran out: keep the slot
+        with self._lock:
+            self._waits.append(time.perf_counter() - t0)
+        return True
+
+    def _release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()      # slot changes hands; in-flight count unchanged
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def slot(self):
+        with span("llm.queue"):
+            ok = self._acquire()
+        if not ok:
+            raise LLMBusy(f"no LLM slot free within {self.queue_timeout_s}s ({self.max_in_flight} in flight)")
+        try:
+            with self._lock:
+                self.counts["calls"] += 1
+            yield
+        finally:
+            self._release()
+
+    def _single_flight(self, key: str, fn: Callable):
+        if not self.coalesce:
+            with self.slot():
+                return fn()
+        with self._lock:
+            fut = self._flights.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._flights[key] = Future()
+            else:
+                self.counts["coalesced"] += 1
+        if not leader:
+            return fut.result()        # the leader's result, or its exception
+        try:
+            with self.slot():
+                out = fn()
+            fut.set_result(out)
+            return out
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    # -- LLMBase
+    def reformulate(self, user_prompt: str) -> str:
+        # LLMBusy propagates: the planner then answers the raw question
+        return self._single_flight(_key("reformulate", self.model, user_prompt),
+                                   lambda: self.inner.reformulate(user_prompt))
+
+    def answer(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+               history: History = None) -> LLMResponse:
+        key = _key("answer", self.model, system_prompt, retrievals, task, max_tokens, temperature, history)
+        try:
+            return self._single_flight(key, lambda: self.inner.answer(system_prompt, retrievals, task, max_tokens,
+                                                                       temperature, history=history))
+        except LLMBusy as exc:
+            print(f"LLM busy: {exc}")
+            with self._lock:
+                self.counts["errors"] += 1
+            return LLMResponse(answer="", citations=[], confidence=0.0, mode="error")
+
+    def answer_stream(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+                      history: History = None) -> Iterator[str]:
+        with self.slot():
+            yield from self.inner.answer_stream(system_prompt, retrievals, task, max_tokens, temperature, history=history)
+
+    # -- observability
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {"max_in_flight": self.max_in_flight, "in_flight": self._in_flight, "queue_depth": len(self._waiters),
+                    "coalescing": len(self._flights), **{k: self.counts[k] for k in ("calls", "coalesced", "timeouts", "errors")},
+                    "wait_p50_s": float(np.percentile(waits, 50)), "wait_p95_s": float(np.percentile(waits, 95)),
+                    "wait_max_s": float(waits.max())}
+
+    def prometheus_text(self) -> str:
+        s = self.stats()
+        lines = []
+        for name, help_ in (("in_flight", "LLM calls running"), ("queue_depth", "LLM calls waiting for a slot")):
+            lines += [f"# HELP ragassist_llm_{name} {help_}", f"# TYPE ragassist_llm_{name} gauge", f"ragassist_llm_{name} {s[name]}"]
+        for name in ("calls", "coalesced", "timeouts"):
+            lines += [f"# TYPE ragassist_llm_{name}_total counter", f"ragassist_llm_{name}_total {s[name]}"]
+        return "\n".join(lines) + "\n"
@@ -1,34 +1,59 @@
+import httpx
 import ollama
+from typing import Iterator, Optional
 from ..mytypes import LLMResponse
-from .llm_base import LLMBase
+from .llm_base import History, LLMBase
 
 class LLMOllama(LLMBase):
-    def __init__(self, model: str):
+    def __init__(self, model: str, keep_alive=None, timeout: Optional[float] = None, max_connections: Optional[int] = None):
         self.model = model
-        self.client = ollama.Client()
+        # one pooled, keep-alive HTTP client per backend, shared by every thread
+        pool = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = ollama.Client(timeout=timeout, limits=pool)
+        self.keep_alive = keep_alive    # how long the server keeps the model (and its KV cache) loaded
 
-    def generate(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> LLMResponse:
-        prompt = f"{system_prompt}\n\n[User Question]\n{user_prompt}"
-        # simple CLI call; replace with HTTP if preferred
-        print(f"User prompt to LLMOllama: {user_prompt}")
+    def reformulate(self, user_prompt: str) -> str:
         sp = "you are an assistant to an AI. Your task is to analyze user's input" \
               " and reformulate into clear and concise request for LLM ingestion. Generate just the request." \
               #f"Document sources marked [Source #] below\n {retrievals}"  # system prompt not used in ollama chat
         result = self.client.chat(
             model=self.model,
+            keep_alive=self.keep_alive,
             messages=[
                 {"role": "system", "content": sp},
                 {"role": "user", "content": f"Analyze and reformulate the following question: {user_prompt}"}
             ]
         )
-        print(f"Reformulated question: {result['message']['content'].strip()}")
-        result = self.client.chat(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"context:\n{retrievals}\n\n [Task]: {result['message']['content'].strip()}"}
-                ]
-        )
+        reform = result['message']['content'].strip()
+        print(f"Reformulated question: {reform}")
+        return reform
+
+    def _messages(self, system_prompt: str, retrievals: str, task: str, history: History = None):
+        if history is not None:
+            # chat layout: everything that changes per turn comes last
+            return ([{"role": "system", "content": f"{system_prompt}\n\ncontext:\n{retrievals}"}]
+                    + list(history) + [{"role": "user", "content": f"[Task]: {task}"}])
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"context:\n{retrievals}\n\n [Task]: {task}"}
+        ]
+
+    def generate(self, system_prompt: str, retrievals: str, user_prompt: str, max_tokens: int, temperature: float) -> LLMResponse:
+        prompt = f"{system_prompt}\n\n[User Question]\n{user_prompt}"
+        # simple CLI call; replace with HTTP if preferred
+        print(f"User prompt to LLMOllama: {user_prompt}")
+        return self.answer(system_prompt, retrievals, self.reformulate(user_prompt), max_tokens, temperature)
+
+    def answer(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+               history: History = None) -> LLMResponse:
+        result = self.client.chat(model=self.model, messages=self._messages(system_prompt, retrievals, task, history),
+                                  keep_alive=self.keep_alive)
         text = result['message']['content'].strip()
         # minimal schema; downstream will extract citations via patterns
         return LLMResponse(answer=text, citations=[], confidence=0.5, mode="answer")
+
+    def answer_stream(self, system_prompt: str, retrievals: str, task: str, max_tokens: int, temperature: float,
+                      history: History = None) -> Iterator[str]:
+        for part in self.client.chat(model=self.model, messages=self._messages(system_prompt, retrievals, task, history),
+                                     stream=True, keep_alive=self.keep_alive):
+            yield part['message']['content']
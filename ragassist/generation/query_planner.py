@@ -0,0 +1,86 @@
+# ragassist/generation/query_planner.py
+import contextvars
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..mytypes import RetrievalHit
+from ..tracing import span
+
+
+def _normalize(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+def _overlap(a: str, b: str) -> float:
+    ta, tb = set(re.findall(r"\w+", a.lower())), set(re.findall(r"\w+", b.lower()))
+    return len(ta & tb) / len(ta | tb) if ta | tb else 1.0
+
+
+class QueryPlanner:
+    """
+    Decides what to retrieve with and what task to hand the answering LLM.
+
+    mode "off":        retrieve with the raw question, answer it as asked (one LLM call).
+    mode "concurrent": reformulate on a worker thread while retrieving with the raw question;
+                       if re_retrieve is set and the rewrite shares less than min_overlap of
+                       its words with the question, retrieve once more with the rewrite.
+    Reformulations are cached (LRU) by normalized question and model.
+    """
+    def __init__(self, llm, retriever, mode: str = "concurrent", re_retrieve: bool = True,
+                 min_overlap: float = 0.5, cache_size: int = 512, workers: int = 8):
+        self.llm = llm
+        self.retriever = retriever
+        self.mode = mode
+        self.re_retrieve = re_retrieve
+        self.min_overlap = min_overlap
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reformulate")
+
+    @classmethod
+    def from_cfg(cls, cfg: Dict, llm, retriever):
+        qp = cfg.get("query_planning", {})
+        return cls(llm, retriever, mode=qp.get("reformulate", "concurrent"), re_retrieve=qp.get("re_retrieve", True),
+                   min_overlap=qp.get("min_overlap", 0.5), cache_size=qp.get("cache_size", 512),
+                   workers=qp.get("workers", 8))
+
+    def reformulate(self, question: str) -> str:
+        key = (getattr(self.llm, "model", ""), _normalize(question))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        try:
+            with span("llm.reformulate"):
+                rewrite = self.llm.reformulate(question).strip() or question
+        except Exception as exc:
+            # planning is an optimization; answer the raw question rather than fail
+            print(f"Reformulation failed: {exc}")
+            return question
+        with self._lock:
+            self._cache[key] = rewrite
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rewrite
+
+    def start(self, questions: List[str]) -> List[Optional[Future]]:
+        """Kick off reformulations so they run while the caller retrieves with the raw questions."""
+        if self.mode == "off":
+            return [None] * len(questions)
+        # copied context: a request's timing collector follows its reformulations onto the pool
+        return [self._pool.submit(contextvars.copy_context().run, self.reformulate, q) for q in questions]
+
+    def finish(self, questions: List[str], futures: List[Optional[Future]], raw_hits: List[List[RetrievalHit]],
+               k: int = 8) -> List[Tuple[str, List[RetrievalHit]]]:
+        tasks = [f.result() if f is not None else q for q, f in zip(questions, futures)]
+        all_hits = list(raw_hits)
+        if self.re_retrieve:
+            redo = [i for i, (q, t) in enumerate(zip(questions, tasks)) if _overlap(q, t) < self.min_overlap]
+            if redo:
+                for i, hits in zip(redo, self.retriever.retrieve_many([tasks[i] for i in redo], k=k)):
+                    all_hits[i] = hits
+        return list(zip(tasks, all_hits))
@@ -1,14 +1,21 @@
-from whoosh.fields import Schema, TEXT, ID, STORED
-from whoosh.index import create_in, open_dir
-from whoosh.qparser import QueryParser
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List
 from ..mytypes import Chunk
+from ..tracing import traced
 
 class BM25Store:
-    def __init__(self, index_dir: str):
+    def __init__(self, index_dir: str, procs: int = 1, limitmb: int = 128, procs_min_docs: int = 2000):
+        self.procs = max(1, procs)
+        self.limitmb = limitmb
+        self.procs_min_docs = procs_min_docs
+        self._writer = None
+        self._buffer = None         # (op, arg) changes held back until a bulk session picks its writer
+        self._buffered_docs = 0
         self.index_dir = Path(index_dir) / "bm25"
         self.index_dir.mkdir(parents=True, exist_ok=True)
+        from whoosh.fields import Schema, TEXT, ID, STORED
+        from whoosh.index import create_in, open_dir
         schema = Schema(id=ID(stored=True, unique=True),
                         content=TEXT(stored=False),
                         file_path=STORED, position=STORED, type=STORED)
@@ -17,15 +24,74 @@ class BM25Store:
         else:
             self.ix = open_dir(self.index_dir)
 
+    def clear(self):
+        from whoosh.index import create_in
+        self.ix = create_in(self.index_dir, self.ix.schema)
+
+    @contextmanager
+    def bulk(self, optimize: bool = True):
+        """
+        One writer for a whole ingest, committed once and (with optimize) merged into a single
+        segment so later searches do not pay for fragmentation. Changes are held back until
+        procs_min_docs documents have arrived: only then is the batch worth starting `procs`
+        indexing processes for; smaller ones (e.g. `watch` batches) get a single-process writer.
+        Writes are visible to searchers only after the session ends.
+        """
+        self._buffer, self._buffered_docs = [], 0
+        if self.procs == 1:
+            self._open(1)
+        try:
+            yield self
+        except BaseException:
+            writer, self._writer, self._buffer = self._writer, None, None
+            if writer is not None:
+                writer.cancel()
+            raise
+        if self._writer is None:
+            self._open(1)
+        writer, self._writer = self._writer, None
+        writer.commit(optimize=optimize)
+
+    def _open(self, procs: int):
+        self._writer = self.ix.writer(procs=procs, multisegment=procs > 1, limitmb=self.limitmb)
+        ops, self._buffer = self._buffer, None
+        self._apply(self._writer, ops)
+
+    @staticmethod
+    def _apply(writer, ops):
+        for op, arg in ops:
+            if op == "add":
+                writer.update_document(id=arg.id, content=arg.text, file_path=arg.file_path, position=arg.position,
+                                       type=arg.type)
+            else:
+                writer.delete_by_term("id", arg)
+
+    def _write(self, ops):
+        if self._buffer is not None:
+            self._buffer.extend(ops)
+            self._buffered_docs += sum(op == "add" for op, _ in ops)
+            if self._buffered_docs >= self.procs_min_docs:
+                self._open(self.procs)
+            return
+        writer = self._writer or self.ix.writer()
+        self._apply(writer, ops)
+        if writer is not self._writer:
+            writer.commit()
+
+    @traced("bm25.add")
     def add(self, chunks: List[Chunk]):
-        writer = self.ix.writer()
-        for c in chunks:
-            writer.add_document(id=c.id, content=c.text, file_path=c.file_path, position=c.position, type=c.type)
-        writer.commit()
+        self._write([("add", c) for c in chunks])
+
+    def delete(self, ids: List[str]):
+        self._write([("delete", cid) for cid in ids])
 
     def search(self, query: str, k: int = 8):
+        return self.search_many([query], k=k)[0]
+
+    @traced("bm25.search")
+    def search_many(self, queries: List[str], k: int = 8):
+        # one searcher and parser for the whole batch
+        from whoosh.qparser import QueryParser
         with self.ix.searcher() as s:
             qp = QueryParser("content", schema=self.ix.schema)
-            q = qp.parse(query)
-            hits = s.search(q, limit=k)
-            return [{"id": h["id"], "score": h.score} for h in hits]
+            return [[{"id": h["id"], "score": h.score} for h in s.search(qp.parse(q), limit=k)] for q in queries]
@@ -0,0 +1,50 @@
+# ragassist/index/chunk_store.py
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from ..mytypes import Chunk
+
+
+class ChunkStore:
+    """
+    Local docstore (chunk ID -> text + metadata) shared by the dense and lexical indices.
+    The indices only return IDs and scores; fused hits from either are hydrated here in
+    one batched primary-key read.
+    """
+    def __init__(self, index_dir: str):
+        path = Path(index_dir) / "chunks.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT, type TEXT, "
+                         "file_path TEXT, position INTEGER, meta TEXT)")
+
+    def put(self, chunks: List[Chunk]):
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)", [
+                (c.id, c.text, c.type, c.file_path, c.position, json.dumps(c.meta)) for c in chunks])
+            self._db.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Chunk]:
+        out: Dict[str, Chunk] = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i+500]
+                q = f"SELECT id, text, type, file_path, position, meta FROM chunks WHERE id IN ({','.join('?' * len(part))})"
+                for cid, text, ctype, fpath, pos, meta in self._db.execute(q, part):
+                    out[cid] = Chunk(id=cid, text=text, type=ctype, file_path=fpath, position=pos, meta=json.loads(meta))
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE id=?", [(cid,) for cid in ids])
+            self._db.commit()
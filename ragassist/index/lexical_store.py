@@ -0,0 +1,238 @@
+# ragassist/index/lexical_store.py
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from ..mytypes import Chunk
+from ..tracing import traced
+
+_WORD = re.compile(r"\w+")
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_STOP = frozenset("a an and are as at be by for from has in is it its of on or that the to was were will with".split())
+
+
+def tokenize(text: str, split_identifiers: bool = True) -> List[str]:
+    """
+    Lowercased word tokens. With split_identifiers, camelCase/snake_case identifiers also
+    emit their parts (getHTTPResponse -> gethttpresponse, get, http, response), so code
+    punctuation like foo.bar() or a::b never needs special query syntax.
+    """
+    out = []
+    for w in _WORD.findall(text):
+        lw = w.lower()
+        if len(lw) > 1 and lw not in _STOP:
+            out.append(lw)
+        if split_identifiers and (w != lw and w != w.upper() or "_" in w.strip("_")):
+            parts = [p.lower() for piece in w.split("_") for p in _SUBWORD.findall(piece)]
+            if len(parts) > 1:
+                out.extend(p for p in parts if len(p) > 1 and p not in _STOP)
+    return out
+
+
+class NativeBM25Store:
+    """
+    BM25 over compact inverted postings kept in NumPy arrays (CSR layout: per-term offsets
+    into doc-index and term-frequency arrays) plus per-doc lengths and a liveness mask.
+    Arrays are saved as .npy and memory-mapped on open. Each save writes a new generation
+    directory and then switches the CURRENT pointer file, so a crash or a concurrent reader
+    never sees a mix of old and new files. Same add/delete/search interface as BM25Store.
+    """
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = Path(index_dir) / "bm25_native"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.k1, self.b = k1, b
+        self._lock = threading.RLock()
+        current = self.index_dir / "CURRENT"
+        # indexes saved before generations existed keep their files directly in index_dir
+        data_dir = self.index_dir / current.read_text().strip() if current.exists() else self.index_dir
+        self._gen = int(data_dir.name.split("-")[1]) if current.exists() else 0
+        if (data_dir / "vocab.json").exists():
+            with open(data_dir / "vocab.json") as f:
+                self.vocab: Dict[str, int] = json.load(f)
+            with open(data_dir / "docs.json") as f:
+                self.doc_ids: List[str] = json.load(f)
+            arr = {n: np.load(data_dir / f"{n}.npy", mmap_mode="r")
+                   for n in ("offsets", "post_docs", "post_tfs", "doc_len", "alive")}
+            self.offsets, self.post_docs, self.post_tfs = arr["offsets"], arr["post_docs"], arr["post_tfs"]
+            self.doc_len, self.alive = arr["doc_len"], np.array(arr["alive"])
+        else:
+            self._reset()
+        self.id_to_doc = {cid: i for i, cid in enumerate(self.doc_ids) if self.alive[i]}
+        self._pending = None        # postings buffered by a bulk() session
+        self._refresh_stats()
+
+    def _reset(self):
+        self.vocab, self.doc_ids, self.id_to_doc = {}, [], {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tfs = np.zeros(0, dtype=np.float32)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=np.bool_)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._save()
+
+    # -- writes
+    @contextmanager
+    def bulk(self, optimize: bool = True):
+        """
+        Buffer postings across batches and merge them into the CSR arrays once at the end,
+        instead of re-sorting every posting on each add. Buffered docs match no query
+        until the session ends.
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            yield self
+        except BaseException:
+            self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending:
+                self._merge(*(np.concatenate(cols) for cols in zip(*pending)))
+            if optimize and (~self.alive).sum() > 0.25 * len(self.alive):
+                self._compact()
+            self._save()
+
+    @traced("bm25.add")
+    def add(self, chunks: List[Chunk]):
+        if not chunks:
+            return
+        with self._lock:
+            self._kill([c.id for c in chunks])   # upsert
+            base = len(self.doc_ids)
+            terms, docs, tfs, lens = [], [], [], []
+            for j, c in enumerate(chunks):
+                toks = tokenize(c.text, split_identifiers=c.type == "code")
+                counts: Dict[int, int] = {}
+                for t in toks:
+                    tid = self.vocab.setdefault(t, len(self.vocab))
+                    counts[tid] = counts.get(tid, 0) + 1
+                terms.extend(counts.keys()); tfs.extend(counts.values())
+                docs.extend([base + j] * len(counts))
+                lens.append(len(toks))
+                self.doc_ids.append(c.id)
+                self.id_to_doc[c.id] = base + j
+            postings = (np.array(terms, dtype=np.int64), np.array(docs, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            if self._pending is None:
+                self._merge(*postings)
+            else:
+                self._pending.append(postings)
+            self.doc_len = np.concatenate([self.doc_len, np.array(lens, dtype=np.float32)])
+            self.alive = np.concatenate([self.alive, np.ones(len(chunks), dtype=np.bool_)])
+            if self._pending is None:
+                self._save()
+
+    def _merge(self, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        n_terms = len(self.vocab)
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        all_terms = np.concatenate([old_terms, terms])
+        # both runs are already grouped by term, so the stable sort is close to linear
+        order = np.argsort(all_terms, kind="stable")
+        self.post_docs = np.concatenate([self.post_docs, docs])[order]
+        self.post_tfs = np.concatenate([self.post_tfs, tfs])[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(all_terms, minlength=n_terms))]).astype(np.int64)
+
+    def _kill(self, ids: List[str]) -> int:
+        docs = [self.id_to_doc.pop(cid) for cid in ids if cid in self.id_to_doc]
+        if docs:
+            # a new array, like every other write: searches scoring a snapshot keep a consistent one
+            alive = self.alive.copy()
+            alive[docs] = False
+            self.alive = alive
+        return len(docs)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            if self._kill(ids) and self._pending is None:
+                if (~self.alive).sum() > 0.25 * len(self.alive):
+                    self._compact()
+                self._save()
+
+    def _compact(self):
+        keep = np.asarray(self.alive)
+        remap = np.cumsum(keep) - 1
+        mask = keep[self.post_docs]
+        terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))[mask]
+        self.post_docs = remap[self.post_docs[mask]].astype(np.int32)
+        self.post_tfs = np.asarray(self.post_tfs)[mask]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocab)))]).astype(np.int64)
+        self.doc_len = np.asarray(self.doc_len)[keep]
+        self.doc_ids = [cid for cid, k in zip(self.doc_ids, keep) if k]
+        self.alive = np.ones(len(self.doc_ids), dtype=np.bool_)
+        self.id_to_doc = {cid: i for i, cid in enumerate(self.doc_ids)}
+
+    def _save(self):
+        self._refresh_stats()
+        self._gen = max([self._gen] + [int(d.name[4:]) for d in self.index_dir.glob("gen-*")]) + 1
+        gen = f"gen-{self._gen:06d}"
+        out = self.index_dir / gen
+        out.mkdir()
+        for name in ("offsets", "post_docs", "post_tfs", "doc_len", "alive"):
+            np.save(out / f"{name}.npy", np.asarray(getattr(self, name)))
+        for name, obj in (("docs", self.doc_ids), ("vocab", self.vocab)):
+            with open(out / f"{name}.json", "w") as f:
+                json.dump(obj, f)
+        tmp = self.index_dir / "CURRENT.tmp"
+        tmp.write_text(gen)
+        os.replace(tmp, self.index_dir / "CURRENT")     # the one atomic switch
+        # keep the previous generation for readers that are opening it right now
+        for old in self.index_dir.glob("gen-*"):
+            if old.name < f"gen-{self._gen - 1:06d}":
+                shutil.rmtree(old, ignore_errors=True)
+        for name in ("offsets", "post_docs", "post_tfs", "doc_len", "alive"):
+            (self.index_dir / f"{name}.npy").unlink(missing_ok=True)
+        for name in ("docs", "vocab"):
+            (self.index_dir / f"{name}.json").unlink(missing_ok=True)
+
+    # -- reads
+    def _refresh_stats(self):
+        self.n_alive = int(self.alive.sum())
+        self.avgdl = float(np.asarray(self.doc_len)[self.alive].mean()) if self.n_alive else 1.0
+
+    def search(self, query: str, k: int = 8):
+        toks = tokenize(query)
+        # writers swap in new arrays instead of changing them in place, so the references taken
+        # here stay consistent and scoring runs without the lock, concurrently with other searches
+        with self._lock:
+            offsets, post_docs, post_tfs = self.offsets, self.post_docs, self.post_tfs
+            doc_len, alive, doc_ids = self.doc_len, self.alive, self.doc_ids
+            n_alive, avgdl, n_docs = self.n_alive, self.avgdl, len(self.doc_ids)
+            # during a bulk session the vocab already holds terms whose postings are still buffered
+            n_terms = len(offsets) - 1
+            tids = sorted({tid for tid in map(self.vocab.get, toks) if tid is not None and tid < n_terms})
+        if not tids or not n_alive:
+            return []
+        all_docs, all_contrib = [], []
+        for t in tids:
+            s, e = offsets[t], offsets[t + 1]
+            docs, tfs = post_docs[s:e], post_tfs[s:e]
+            live = alive[docs]
+            docs, tfs = docs[live], tfs[live]
+            if not len(docs):
+                continue
+            idf = np.log1p((n_alive - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / avgdl)
+            all_docs.append(docs)
+            all_contrib.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not all_docs:
+            return []
+        scores = np.bincount(np.concatenate(all_docs), weights=np.concatenate(all_contrib), minlength=n_docs)
+        cand = np.flatnonzero(scores > 0)
+        if len(cand) > k:
+            cand = cand[np.argpartition(-scores[cand], k - 1)[:k]]
+        cand = cand[np.argsort(-scores[cand])]
+        return [{"id": doc_ids[d], "score": float(scores[d])} for d in cand]
+
+    @traced("bm25.search")
+    def search_many(self, queries: List[str], k: int = 8):
+        return [self.search(q, k=k) for q in queries]
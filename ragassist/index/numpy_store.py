@@ -0,0 +1,193 @@
+# ragassist/index/numpy_store.py
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from ..mytypes import Chunk
+from ..tracing import traced
+
+
+class NumpyVectorStore:
+    """
+    Normalized embeddings in one contiguous memory-mapped matrix, with a SQLite side table
+    (row -> id, metadata) and a liveness mask. A query is a single matmul over
+    the matrix plus argpartition; only the k winning rows are looked up in the side table.
+    Same add/delete/query interface (and Chroma-shaped query results) as VectorStore.
+    """
+    _BLOCK = 1 << 16   # rows per matmul block when upcasting float16
+
+    def __init__(self, collection: str, persist_dir: str, dtype: str = "float32"):
+        self.dir = Path(persist_dir) / "numpy_vectors" / collection
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.dir / "items.sqlite", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS items (row INTEGER PRIMARY KEY, id TEXT UNIQUE, meta TEXT)")
+        self._meta_path = self.dir / "meta.json"
+        if self._meta_path.exists():
+            with open(self._meta_path) as f:
+                info = json.load(f)
+            self.dtype, self.dim, self.count = np.dtype(info["dtype"]), info["dim"], info["count"]
+            self._map(max(self.count, 1))
+        else:
+            self.dtype, self.dim, self.count = np.dtype(dtype), 0, 0
+            self._vecs = self._alive = None
+            self.capacity = 0
+        self._bulk = False
+        self._epoch = 0      # bumped whenever rows are renumbered; queries scored across a change retry
+
+    # -- storage
+    def _map(self, capacity: int):
+        for name, width in (("vectors.bin", self.dim * self.dtype.itemsize), ("alive.bin", 1)):
+            p = self.dir / name
+            with open(p, "a+b") as f:
+                if f.seek(0, 2) < capacity * width:
+                    f.truncate(capacity * width)
+        self.capacity = capacity
+        self._vecs = np.memmap(self.dir / "vectors.bin", dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        self._alive = np.memmap(self.dir / "alive.bin", dtype=np.bool_, mode="r+", shape=(capacity,))
+
+    def _save_meta(self):
+        tmp = self._meta_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dtype": self.dtype.name, "dim": self.dim, "count": self.count}, f)
+        os.replace(tmp, self._meta_path)
+
+    def _flush(self):
+        self._vecs.flush(); self._alive.flush()
+        self._db.commit()
+        self._save_meta()
+
+    def clear(self):
+        """Drop every vector; the next add starts a new matrix."""
+        with self._lock:
+            self._db.execute("DELETE FROM items")
+            self._db.commit()
+            self._vecs = self._alive = None
+            self.dim, self.count, self.capacity = 0, 0, 0
+            self._epoch += 1
+            for name in ("vectors.bin", "alive.bin", "meta.json"):
+                (self.dir / name).unlink(missing_ok=True)
+
+    # -- writes
+    @contextmanager
+    def bulk(self, optimize: bool = True):
+        """Defer flushing and compaction to the end of a multi-batch write."""
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+        self._epoch = 0      # bumped whenever rows are renumbered; queries scored across a change retry
+        with self._lock:
+            if self._vecs is not None:
+                self._flush()
+        if optimize and self.dead_fraction() > 0.5 and self.count > 1024:
+            self.compact()
+
+    @traced("vector.add")
+    def add(self, chunks: List[Chunk], embeddings: np.ndarray):
+        if not chunks:
+            return
+        embeddings = np.asarray(embeddings)
+        with self._lock:
+            if self._vecs is None:
+                self.dim = embeddings.shape[1]
+                self._map(1024)
+            # upsert: retire previous rows of re-added IDs
+            self._kill([c.id for c in chunks])
+            n = len(chunks)
+            if self.count + n > self.capacity:
+                self._vecs.flush(); self._alive.flush()
+                self._map(max(self.count + n, self.capacity * 2))
+            rows = range(self.count, self.count + n)
+            self._vecs[self.count:self.count + n] = embeddings.astype(self.dtype, copy=False)
+            self._alive[self.count:self.count + n] = True
+            self._db.executemany("INSERT INTO items VALUES (?, ?, ?)", [
+                (r, c.id, json.dumps({"file_path": c.file_path, "type": c.type, "position": c.position}))
+                for r, c in zip(rows, chunks)])
+            self.count += n
+            if not self._bulk:
+                self._flush()
+        if not self._bulk and self.dead_fraction() > 0.5 and self.count > 1024:
+            self.compact()
+
+    def _kill(self, ids: List[str]):
+        rows = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i+500]
+            q = f"SELECT row FROM items WHERE id IN ({','.join('?' * len(part))})"
+            rows += [r for (r,) in self._db.execute(q, part).fetchall()]
+        if rows:
+            self._alive[rows] = False
+            self._db.executemany("DELETE FROM items WHERE row=?", [(r,) for r in rows])
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            if self._vecs is None:
+                return
+            self._kill(ids)
+            if not self._bulk:
+                self._flush()
+
+    def dead_fraction(self) -> float:
+        return 1.0 - float(self._alive[:self.count].sum()) / self.count if self.count else 0.0
+
+    def compact(self):
+        """Rewrite the matrix without deleted rows."""
+        with self._lock:
+            keep = np.flatnonzero(self._alive[:self.count])
+            vecs = np.array(self._vecs[keep])
+            remap = [(int(new), int(old)) for new, old in enumerate(keep)]
+            self._epoch += 1
+            self._db.execute("UPDATE items SET row = -row - 1")
+            self._db.executemany("UPDATE items SET row=? WHERE row=?", [(new, -old - 1) for new, old in remap])
+            self.count = len(keep)
+            self._vecs[:self.count] = vecs
+            self._alive[:] = False
+            self._alive[:self.count] = True
+            self._flush()
+
+    # -- reads
+    def _scores(self, Q: np.ndarray, V: np.ndarray, alive: np.ndarray) -> np.ndarray:
+        if V.dtype == np.float32:
+            S = Q @ V.T
+        else:
+            # no BLAS for float16: upcast block by block
+            S = np.empty((Q.shape[0], len(V)), dtype=np.float32)
+            for i in range(0, len(V), self._BLOCK):
+                S[:, i:i + self._BLOCK] = Q @ V[i:i + self._BLOCK].astype(np.float32).T
+        S[:, ~alive] = -np.inf
+        return S
+
+    @traced("vector.query")
+    def query(self, q_emb: np.ndarray, k: int = 8):
+        """q_emb may be one vector or a (n_queries, dim) batch; results are per query, Chroma-style."""
+        Q = np.atleast_2d(np.asarray(q_emb, dtype=np.float32))
+        res = {"ids": [], "distances": []}
+        # score a snapshot without the lock (BLAS releases the GIL), so concurrent queries overlap;
+        # appends only go past `count` and deletes only clear alive flags, both safe to race with
+        with self._lock:
+            count, V, alive, epoch = self.count, self._vecs, self._alive, self._epoch
+        if not count:
+            for key in res: res[key] = [[] for _ in range(len(Q))]
+            return res
+        S = self._scores(Q, V[:count], alive[:count])
+        kk = min(k, count)
+        top = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+        with self._lock:
+            if self._epoch != epoch:
+                return self.query(q_emb, k=k)      # compacted or cleared meanwhile: row numbers changed
+            for qi in range(len(Q)):
+                rows = top[qi][np.argsort(-S[qi, top[qi]])]
+                rows = [int(r) for r in rows if np.isfinite(S[qi, r])]
+                q = f"SELECT row, id FROM items WHERE row IN ({','.join('?' * len(rows))})"
+                found = dict(self._db.execute(q, rows).fetchall())
+                rows = [r for r in rows if r in found]
+                res["ids"].append([found[r] for r in rows])
+                res["distances"].append([1.0 - float(S[qi, r]) for r in rows])   # cosine distance
+        return res
@@ -0,0 +1,41 @@
+from typing import Dict
+from .chunk_store import ChunkStore
+
+# providers are imported per branch so only the selected backend's dependencies load
+
+
+def get_vector_store(cfg: Dict):
+    """Return the dense store selected by cfg['vector_store']['provider']."""
+    vs_cfg = cfg["vector_store"]
+    provider = vs_cfg.get("provider", "chroma").lower()
+    index_dir = cfg["project"]["index_dir"]
+
+    if provider in ("numpy", "mmap"):
+        from .numpy_store import NumpyVectorStore
+        return NumpyVectorStore(vs_cfg["collection"], index_dir, dtype=vs_cfg.get("dtype", "float32"))
+
+    # default: chroma
+    from .vector_store import VectorStore
+    return VectorStore(vs_cfg["collection"], index_dir)
+
+
+def get_bm25_store(cfg: Dict):
+    """Return the lexical store, or None when cfg['bm25']['enabled'] is off."""
+    bm25_cfg = cfg["bm25"]
+    if not bm25_cfg["enabled"]:
+        return None
+    provider = bm25_cfg.get("provider", "whoosh").lower()
+
+    if provider == "native":
+        from .lexical_store import NativeBM25Store
+        return NativeBM25Store(cfg["project"]["index_dir"])
+
+    # default: whoosh
+    from .bm25_store import BM25Store
+    return BM25Store(cfg["project"]["index_dir"], procs=bm25_cfg.get("procs", 1), limitmb=bm25_cfg.get("limitmb", 128),
+                     procs_min_docs=bm25_cfg.get("procs_min_docs", 2000))
+
+
+def get_chunk_store(cfg: Dict):
+    """Return the docstore both indices hydrate their hits from."""
+    return ChunkStore(cfg["project"]["index_dir"])
@@ -1,24 +1,74 @@
-from chromadb import Client
-from chromadb.config import Settings
 import numpy as np
+from contextlib import contextmanager
 from typing import List
 from ..mytypes import Chunk
+from ..tracing import traced
 
 class VectorStore:
     def __init__(self, collection: str, persist_dir: str):
+        from chromadb import Client
+        from chromadb.config import Settings
         self.client = Client(Settings(is_persistent=True, persist_directory=persist_dir))
+        self.collection = collection
         self.col = self.client.get_or_create_collection(collection)
+        self.max_batch = getattr(self.client, "get_max_batch_size", lambda: 5000)()
+        self._buffer = None
 
+    def clear(self):
+        """Drop every vector: the collection is deleted and created again."""
+        self.client.delete_collection(self.collection)
+        self.col = self.client.get_or_create_collection(self.collection)
+
+    @contextmanager
+    def bulk(self, optimize: bool = True):
+        """
+        Buffer adds across batches and upsert them in chunks of the client's max batch size.
+        Deletes still apply immediately: they only ever target chunks written by earlier runs.
+        """
+        self._buffer = ([], [])
+        try:
+            yield self
+        except BaseException:
+            self._buffer = None
+            raise
+        chunks, embs = self._buffer
+        self._buffer = None
+        if chunks:
+            self._upsert(chunks, np.concatenate(embs))
+
+    @traced("vector.add")
     def add(self, chunks: List[Chunk], embeddings: np.ndarray):
-        self.col.add(
-            ids=[c.id for c in chunks],
-            embeddings=embeddings.tolist(),
-            metadatas=[{
-                "file_path": c.file_path, "type": c.type, "position": c.position
-            } for c in chunks],
-            documents=[c.text for c in chunks],
-        )
+        if self._buffer is None:
+            self._upsert(chunks, embeddings)
+            return
+        self._buffer[0].extend(chunks)
+        self._buffer[1].append(np.asarray(embeddings, dtype=np.float32))
+        if len(self._buffer[0]) >= self.max_batch:
+            chunks, embs = self._buffer
+            self._buffer = ([], [])
+            self._upsert(chunks, np.concatenate(embs))
+
+    def _upsert(self, chunks: List[Chunk], embeddings: np.ndarray):
+        # upsert keeps re-runs idempotent now that chunk IDs are deterministic;
+        # chromadb takes the float32 matrix as is, no per-element Python floats
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        for i in range(0, len(chunks), self.max_batch):
+            part = chunks[i:i + self.max_batch]
+            self.col.upsert(
+                ids=[c.id for c in part],
+                embeddings=embeddings[i:i + self.max_batch],
+                metadatas=[{
+                    "file_path": c.file_path, "type": c.type, "position": c.position
+                } for c in part],
+            )
+
+    def delete(self, ids: List[str], batch: int = 5000):
+        for i in range(0, len(ids), batch):
+            self.col.delete(ids=ids[i:i+batch])
 
+    @traced("vector.query")
     def query(self, q_emb: np.ndarray, k: int = 8):
-        res = self.col.query(query_embeddings=[q_emb.tolist()], n_results=k)
+        # one vector or a (n_queries, dim) batch; results are per query
+        # texts live in the ChunkStore; only IDs and distances come back
+        res = self.col.query(query_embeddings=np.atleast_2d(q_emb).astype(np.float32), n_results=k, include=["distances"])
         return res
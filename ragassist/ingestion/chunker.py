@@ -1,19 +1,28 @@
-from typing import List
+from pathlib import Path
+from typing import List, Tuple
 from ..mytypes import Chunk
-import uuid
-# optional: tree_sitter integration for better code segmentation
+import hashlib
+from ..tracing import traced
+from .code_splitters import get_splitter
+
+# bump when chunk boundaries change for the same settings; part of the ingest fingerprint
+CHUNKER_VERSION = 2
+CHARS_PER_TOKEN = 4.0
 
 class Chunker:
     def __init__(self, cfg):
         self.cfg = cfg
 
+    @traced("chunk")
     def chunk(self, text: str, fpath: str, ftype: str) -> List[Chunk]:
         if ftype == "code":
             return self._code_chunks(text, fpath)
         return self._text_chunks(text, fpath)
 
     def _make(self, text, fpath, pos, ftype) -> Chunk:
-        return Chunk(id=str(uuid.uuid4()), text=text, type=ftype, file_path=fpath, position=pos, meta={})
+        # content-addressed: same file/position/text always maps to the same ID
+        cid = hashlib.sha1(f"{fpath}\0{pos}\0{ftype}\0{text}".encode("utf-8", "replace")).hexdigest()
+        return Chunk(id=cid, text=text, type=ftype, file_path=fpath, position=pos, meta={})
 
     def _text_chunks(self, text: str, fpath: str) -> List[Chunk]:
         # simple token-ish windowing; replace with sentence splitter if desired
@@ -29,13 +38,58 @@ class Chunker:
         return chunks
 
     def _code_chunks(self, text: str, fpath: str) -> List[Chunk]:
-        # placeholder: function-level split could be done via tree-sitter
-        lines = text.splitlines()
-        max_lines = 60
-        overlap = 8
-        chunks, start = [], 0
-        while start < len(lines):
-            end = min(start + max_lines, len(lines))
-            chunks.append(self._make("\n".join(lines[start:end]), fpath, start, "code"))
-            start = end - overlap if end - overlap > start else end
-        return chunks
+        """
+        One chunk per function/class/method where the language has a splitter, with small
+        neighbours packed together up to max_tokens; oversized classes are opened up and
+        oversized bodies windowed with overlap_tokens. Chunks are always whole, contiguous
+        lines starting at `position`, so neighbours can be stitched back together later.
+        """
+        ccfg = self.cfg["chunking"]["code"]
+        max_toks, overlap = ccfg.get("max_tokens", 320), ccfg.get("overlap_tokens", 32)
+        lines = text.replace("\r\n", "\n").split("\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        cum = [0]
+        for line in lines:
+            cum.append(cum[-1] + len(line) + 1)
+        toks = lambda s, e: (cum[e] - cum[s]) / CHARS_PER_TOKEN
+
+        splitter = get_splitter(Path(fpath).suffix) if ccfg.get("strategy", "ast") != "lines" else None
+        units = splitter(lines) if splitter else None
+        if units is None:
+            ranges = self._windows(0, len(lines), toks, max_toks, overlap)
+        else:
+            ranges = self._pack(units, toks, max_toks, overlap)
+        return [self._make("\n".join(lines[s:e]), fpath, s, "code") for s, e in ranges
+                if any(line.strip() for line in lines[s:e])]
+
+    def _pack(self, units, toks, max_toks, overlap) -> List[Tuple[int, int]]:
+        out, cur = [], None
+        for s, e, children in units:
+            if toks(s, e) > max_toks:
+                if cur: out.append(cur)
+                cur = None
+                out += self._pack(children, toks, max_toks, overlap) if children else \
+                    self._windows(s, e, toks, max_toks, overlap)
+            elif cur and toks(cur[0], e) <= max_toks:
+                cur = (cur[0], e)
+            else:
+                if cur: out.append(cur)
+                cur = (s, e)
+        if cur: out.append(cur)
+        return out
+
+    def _windows(self, start, end, toks, max_toks, overlap) -> List[Tuple[int, int]]:
+        out = []
+        while start < end:
+            stop = start + 1
+            while stop < end and toks(start, stop + 1) <= max_toks:
+                stop += 1
+            out.append((start, stop))
+            if stop >= end:
+                break
+            nxt = stop
+            while nxt - 1 > start and toks(nxt - 1, stop) <= overlap:
+                nxt -= 1
+            start = nxt
+        return out
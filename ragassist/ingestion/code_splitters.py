@@ -0,0 +1,60 @@
+# ragassist/ingestion/code_splitters.py
+"""
+Per-language structure for the code chunker. A splitter takes the file's lines and
+returns its top-level units as contiguous (start, end, children) line ranges covering
+every line in order; `children` are the units inside a class (or similar) so an
+oversized container can be opened up. Languages without a splitter are windowed.
+"""
+import ast
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Unit = Tuple[int, int, list]        # [start, end) 0-based line range, nested units
+Splitter = Callable[[List[str]], Optional[List[Unit]]]
+
+_SPLITTERS: Dict[str, Splitter] = {}
+
+
+def register_splitter(exts: Iterable[str], fn: Splitter):
+    for ext in exts:
+        _SPLITTERS[ext.lower()] = fn
+
+
+def get_splitter(ext: str) -> Optional[Splitter]:
+    return _SPLITTERS.get(ext.lower())
+
+
+def _starts(stmts: List[ast.stmt], lines: List[str], floor: int) -> List[int]:
+    # a statement starts at its first decorator, and takes the comments right above it along
+    out = []
+    for st in stmts:
+        s = min([st.lineno] + [d.lineno for d in getattr(st, "decorator_list", [])]) - 1
+        while s - 1 >= floor and lines[s - 1].lstrip().startswith("#"):
+            s -= 1
+        out.append(max(s, floor))
+    return out
+
+
+def _units(stmts: List[ast.stmt], lines: List[str], start: int, end: int) -> List[Unit]:
+    if not stmts:
+        return [(start, end, [])] if end > start else []
+    starts = _starts(stmts, lines, start)
+    starts[0] = start                      # header lines (imports, docstring, signature) join the first unit
+    bounds = starts[1:] + [end]
+    units = []
+    for st, s, e in zip(stmts, starts, bounds):
+        children = []
+        if isinstance(st, ast.ClassDef) and st.body:
+            children = _units(st.body, lines, s, e)
+        units.append((s, e, children))
+    return units
+
+
+def python_splitter(lines: List[str]) -> Optional[List[Unit]]:
+    try:
+        tree = ast.parse("\n".join(lines))
+    except (SyntaxError, ValueError):
+        return None                        # not valid Python 3: caller windows the file
+    return _units(tree.body, lines, 0, len(lines))
+
+
+register_splitter([".py", ".pyi"], python_splitter)
@@ -0,0 +1,153 @@
+# ragassist/ingestion/dedup.py
+"""
+Exact and near-duplicate detection for chunks, between the chunker and the embedder.
+Exact copies match on a hash of the whitespace-normalized text; near copies on MinHash
+signatures over word shingles, found through LSH banding and confirmed by the estimated
+Jaccard similarity. Only the first (canonical) copy is embedded and indexed; the others
+become alternate locations in its metadata. Signatures live in <index_dir>/dedup.sqlite
+so later runs and `watch` compare against the whole index.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..mytypes import Chunk
+
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+
+class ChunkDeduper:
+    def __init__(self, index_dir: str, threshold: float = 0.85, num_perm: int = 64, bands: int = 16,
+                 shingle: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("dedup.num_perm must be a multiple of dedup.bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._pending: Dict[str, Tuple[str, Optional[np.ndarray], str]] = {}   # signatures of resolved, unwritten canonicals
+        self._lock = threading.Lock()
+        path = Path(index_dir) / "dedup.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sigs (id TEXT PRIMARY KEY, exact TEXT, sig BLOB)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sigs_exact ON sigs (exact)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bands (key TEXT, id TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (key)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_id ON bands (id)")
+
+    @classmethod
+    def from_cfg(cls, cfg: Dict) -> Optional["ChunkDeduper"]:
+        d = cfg.get("dedup", {})
+        if not d.get("enabled", True):
+            return None
+        return cls(cfg["project"]["index_dir"], threshold=d.get("threshold", 0.85), num_perm=d.get("num_perm", 64),
+                   bands=d.get("bands", 16), shingle=d.get("shingle_words", 5))
+
+    def signature(self, c: Chunk) -> Tuple[str, Optional[np.ndarray]]:
+        """Exact key, and the MinHash signature (None when the chunk is shorter than one shingle)."""
+        words = _WORD.findall(c.text.lower())
+        exact = hashlib.sha1(f"{c.type}\0{' '.join(c.text.split())}".encode("utf-8", "replace")).hexdigest()
+        if len(words) < self.shingle:
+            return exact, None
+        shingles = {" ".join(words[i:i + self.shingle]) for i in range(len(words) - self.shingle + 1)}
+        h = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return exact, ((self._a * h + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, ctype: str, sig: np.ndarray) -> List[str]:
+        return [f"{ctype}:{i}:{sig[i * self.rows:(i + 1) * self.rows].tobytes().hex()}" for i in range(self.bands)]
+
+    def _similar(self, sig: np.ndarray, other: Optional[np.ndarray]) -> bool:
+        return other is not None and float(np.mean(sig == other)) >= self.threshold
+
+    def resolve(self, chunks: List[Chunk], exclude: Set[str] = frozenset()) -> List[Optional[Tuple[str, str]]]:
+        """
+        For each chunk, (canonical ID, "exact" | "near") when it duplicates an indexed
+        chunk or an earlier one in `chunks`, else None: the chunk becomes canonical itself.
+        IDs in `exclude` (chunks about to leave the index) are never chosen as canonical.
+        """
+        sigs = [self.signature(c) for c in chunks]
+        keys = [self._band_keys(c.type, s) if s is not None else [] for c, (_, s) in zip(chunks, sigs)]
+        with self._lock:
+            by_exact = {e: cid for e, cid in self._rows("SELECT exact, id FROM sigs WHERE exact IN ({})", [e for e, _ in sigs])
+                        if cid not in exclude}
+            by_exact.update({e: cid for cid, (e, _, _) in self._pending.items() if cid not in exclude})
+            by_band: Dict[str, Set[str]] = {}
+            for k, cid in self._rows("SELECT key, id FROM bands WHERE key IN ({})", [k for ks in keys for k in ks]):
+                if cid not in exclude:
+                    by_band.setdefault(k, set()).add(cid)
+            for cid, (_, s, ctype) in self._pending.items():
+                if s is not None and cid not in exclude:
+                    for k in self._band_keys(ctype, s):
+                        by_band.setdefault(k, set()).add(cid)
+            cand_sigs = dict(self._rows("SELECT id, sig FROM sigs WHERE id IN ({})",
+                                        list({cid for ids in by_band.values() for cid in ids})))
+            out = []
+            for c, (exact, sig), ks in zip(chunks, sigs, keys):
+                hit = None
+                cid = by_exact.get(exact)
+                if cid is not None and cid != c.id:
+                    hit = (cid, "exact")
+                elif sig is not None and cid is None:
+                    for cand in sorted({x for k in ks for x in by_band.get(k, ())}):
+                        other = self._pending[cand][1] if cand in self._pending else \
+                            np.frombuffer(cand_sigs[cand], dtype=np.uint32) if cand in cand_sigs else None
+                        if cand != c.id and self._similar(sig, other):
+                            hit = (cand, "near")
+                            break
+                out.append(hit)
+                if hit is None:
+                    # canonical from here on, for the rest of this batch and for later ones
+                    self._pending[c.id] = (exact, sig, c.type)
+                    by_exact.setdefault(exact, c.id)
+                    for k in ks:
+                        by_band.setdefault(k, set()).add(c.id)
+            return out
+
+    def _rows(self, sql: str, params: List[str]) -> List[Tuple]:
+        rows = []
+        params = list(dict.fromkeys(params))
+        for i in range(0, len(params), 500):
+            part = params[i:i + 500]
+            rows += self._db.execute(sql.format(",".join("?" * len(part))), part).fetchall()
+        return rows
+
+    def add(self, chunks: Iterable[Chunk]):
+        """Record canonicals written to the index (resolve() keeps their signatures until then)."""
+        rows, bands = [], []
+        with self._lock:
+            for c in chunks:
+                exact, sig = (self._pending.pop(c.id, None) or self.signature(c))[:2]
+                rows.append((c.id, exact, sig.tobytes() if sig is not None else None))
+                bands += [(k, c.id) for k in (self._band_keys(c.type, sig) if sig is not None else [])]
+            self._db.executemany("INSERT OR REPLACE INTO sigs VALUES (?, ?, ?)", rows)
+            self._db.executemany("DELETE FROM bands WHERE id=?", [(r[0],) for r in rows])
+            self._db.executemany("INSERT INTO bands VALUES (?, ?)", bands)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._db.execute("DELETE FROM sigs")
+            self._db.execute("DELETE FROM bands")
+            self._db.commit()
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for cid in ids:
+                self._pending.pop(cid, None)
+            self._db.executemany("DELETE FROM sigs WHERE id=?", [(cid,) for cid in ids])
+            self._db.executemany("DELETE FROM bands WHERE id=?", [(cid,) for cid in ids])
+            self._db.commit()
@@ -1,22 +1,65 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional
 import numpy as np
 from ..mytypes import Chunk
+from .embedding_cache import EmbeddingCache
+from .embedding_runtime import load_embedding_model
+from ..tracing import traced
 
 class Embedder:
-    def __init__(self, text_model: str, code_model: str, device: str = "auto"):
-        self.text_model = SentenceTransformer(text_model, device=device)
-        self.code_model = SentenceTransformer(code_model, device=device)
+    def __init__(self, text_model: str, code_model: str, device: str = "auto", batch_size: int = 64,
+                 cache_dir: Optional[str] = None, cache_max_mb: int = 1024, runtime: str = "torch",
+                 artifacts_dir: Optional[str] = None, quantization: Optional[str] = None, runtime_tag: str = ""):
+        device = None if device == "auto" else device
+        load = lambda name: load_embedding_model(name, runtime, device=device, artifacts_dir=artifacts_dir,
+                                                 quantization=quantization)
+        self.text_model_name = text_model
+        self.code_model_name = code_model
+        self.batch_size = batch_size
+        self.text_model = load(text_model)
+        # same checkpoint for both types: load it once
+        self.code_model = self.text_model if code_model == text_model else load(code_model)
+        self.caches: Dict[int, EmbeddingCache] = {}
+        if cache_dir:
+            for name, m in ((text_model, self.text_model), (code_model, self.code_model)):
+                if id(m) not in self.caches:
+                    # quantized vectors differ from the reference model's: never share cache entries
+                    key = f"{name}@{runtime_tag}" if runtime_tag else name
+                    self.caches[id(m)] = EmbeddingCache(cache_dir, key, m.get_sentence_embedding_dimension(), cache_max_mb)
 
+    @traced("embed_batch")
     def embed_batch(self, chunks: List[Chunk]) -> Dict[str, np.ndarray]:
-        texts, ids = [], []
-        for c in chunks:
-            texts.append(c.text)
-            ids.append(c.id)
-        # route to model by type (code vs text)
-        # simple split:
-        embs = []
-        for c in chunks:
+        ids = [c.id for c in chunks]
+        if not chunks:
+            return {"ids": ids, "embeddings": np.zeros((0, self.text_model.get_sentence_embedding_dimension()), dtype=np.float32)}
+        # route to model by type (code vs text); one group when both types share a model
+        groups: Dict[int, List[int]] = {}
+        for i, c in enumerate(chunks):
             m = self.code_model if c.type == "code" else self.text_model
-            embs.append(m.encode(c.text, normalize_embeddings=True))
-        return {"ids": ids, "embeddings": np.vstack(embs)}
+            groups.setdefault(id(m), []).append(i)
+        models = {id(self.text_model): self.text_model, id(self.code_model): self.code_model}
+
+        out = None
+        for key, idx in groups.items():
+            texts = [chunks[i].text for i in idx]
+            cache = self.caches.get(key)
+            if cache:
+                embs, todo = cache.get_many(texts)
+            else:
+                embs, todo = None, list(range(len(texts)))
+            if todo:
+                # longest first so each encode batch holds similar lengths (less padding)
+                todo.sort(key=lambda j: len(texts[j]), reverse=True)
+                fresh = models[key].encode([texts[j] for j in todo], batch_size=self.batch_size,
+                                           normalize_embeddings=True, convert_to_numpy=True)
+                if embs is None:
+                    embs = np.empty((len(texts), fresh.shape[1]), dtype=fresh.dtype)
+                embs[todo] = fresh
+                if cache:
+                    cache.put_many([texts[j] for j in todo], fresh)
+            if out is None:
+                out = np.empty((len(chunks), embs.shape[1]), dtype=embs.dtype)
+            out[idx] = embs
+        return {"ids": ids, "embeddings": out}
+
+    def cache_stats(self) -> str:
+        return "; ".join(c.stats() for c in self.caches.values())
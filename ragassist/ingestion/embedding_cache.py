@@ -0,0 +1,129 @@
+# ragassist/ingestion/embedding_cache.py
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+
+def text_key(text: str) -> str:
+    # whitespace/unicode-form differences do not change what the model sees
+    norm = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha1(norm.encode("utf-8", "replace")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of vectors for one model: a memory-mapped float32 matrix (one row per
+    entry) plus a SQLite table mapping text hash -> row and a last-used clock. When the
+    size budget is reached the least recently used rows are overwritten. Several processes
+    may share one cache: rows are handed out inside a SQLite write transaction.
+    """
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_mb: int = 1024):
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.max_rows = max(1, (max_mb << 20) // (dim * 4))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.dir / "index.sqlite", timeout=30, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER, used INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries(used)")
+        self._clock = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM entries").fetchone()[0]
+        self._rows = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+        self._path = self.dir / "vectors.f32"
+        self._path.touch()
+        self._open(max(self._path.stat().st_size // (dim * 4), 1024))
+
+    def _open(self, capacity: int):
+        capacity = min(capacity, max(self.max_rows, self._rows))
+        with open(self._path, "r+b") as f:
+            if f.seek(0, 2) < capacity * self.dim * 4:
+                f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self._vecs = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure(self, rows: int):
+        # another process may have grown the matrix past what this one has mapped
+        self._rows = max(self._rows, rows)
+        if self._rows > self.capacity:
+            self._vecs.flush()
+            self._open(max(self._rows, self.capacity * 2))
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """Returns (matrix with cached rows filled in, indices of texts that missed)."""
+        keys = [text_key(t) for t in texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        with self._lock:
+            found = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                q = f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                found.update(self._db.execute(q, part).fetchall())
+            if found:
+                self._ensure(max(found.values()) + 1)
+            missing = []
+            for i, k in enumerate(keys):
+                row = found.get(k)
+                if row is None:
+                    missing.append(i)
+                else:
+                    out[i] = self._vecs[row]
+            if found:
+                self._clock += 1
+                self._db.executemany("UPDATE entries SET used=? WHERE key=?", [(self._clock, k) for k in found])
+                self._db.commit()
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return out, missing
+
+    def put_many(self, texts: List[str], vecs: np.ndarray):
+        all_keys = [text_key(t) for t in texts]
+        first = dict(zip(all_keys, range(len(texts))))
+        keys = list(first)
+        with self._lock:
+            # the write lock is held from the lookup to the commit, so processes sharing the
+            # cache never hand out the same row twice
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                present = set()
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i+500]
+                    q = f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                    present.update(k for (k,) in self._db.execute(q, part).fetchall())
+                keys = [k for k in keys if k not in present][:self.max_rows]
+                if keys:
+                    rows = self._allocate(len(keys))
+                    latest = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM entries").fetchone()[0]
+                    self._clock = max(self._clock, latest) + 1
+                    for k, row in zip(keys, rows):
+                        self._vecs[row] = vecs[first[k]]
+                    self._vecs.flush()
+                    self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                                         [(k, row, self._clock) for k, row in zip(keys, rows)])
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def _allocate(self, n: int) -> List[int]:
+        # rows in use come from the table, not this process's count: others may have added some
+        used = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+        free = max(0, min(n, self.max_rows - used))
+        rows = list(range(used, used + free))
+        self._ensure(used + free)
+        if len(rows) < n:
+            # full: recycle the least recently used rows
+            victims = self._db.execute("SELECT key, row FROM entries ORDER BY used LIMIT ?", (n - len(rows),)).fetchall()
+            self._db.executemany("DELETE FROM entries WHERE key=?", [(k,) for k, _ in victims])
+            rows += [r for _, r in victims]
+        return rows
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} hits ({100.0 * self.hits / total if total else 0:.0f}%), {self._rows} cached"
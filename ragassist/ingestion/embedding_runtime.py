@@ -0,0 +1,97 @@
+# ragassist/ingestion/embedding_runtime.py
+"""
+Loads embedding models for Embedder and Retriever. runtime "torch" is the plain
+SentenceTransformer. "onnx-int8" exports the model to ONNX once, applies dynamic
+int8 quantization for the host CPU, and keeps the artifact under
+<index_dir>/onnx_models so later runs load it directly (needs
+sentence-transformers>=3.2 and optimum[onnxruntime]).
+"""
+import platform
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+RUNTIMES = ("torch", "onnx-int8")
+
+
+def quantization_target() -> str:
+    """Best dynamic quantization config sentence-transformers offers for this CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    return "avx512" if "avx512f" in flags else "avx2"
+
+
+def runtime_tag(emb_cfg: Dict) -> str:
+    """Distinguishes vectors produced by different runtimes (embedding cache, fingerprint)."""
+    runtime = emb_cfg.get("runtime", "torch")
+    if runtime == "torch":
+        return ""
+    return f"{runtime}-{emb_cfg.get('quantization') or quantization_target()}"
+
+
+def _export_dir(model_name: str, artifacts_dir: str, target: str) -> Path:
+    return Path(artifacts_dir) / "onnx_models" / f"{re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name)}-{target}"
+
+
+def load_embedding_model(model_name: str, runtime: str = "torch", device: Optional[str] = None,
+                         artifacts_dir: Optional[str] = None, quantization: Optional[str] = None):
+    from sentence_transformers import SentenceTransformer  # heavy: torch + transformers
+    if runtime == "torch":
+        return SentenceTransformer(model_name, device=device)
+    if runtime != "onnx-int8":
+        raise ValueError(f"unknown embedding runtime {runtime!r}; expected one of {RUNTIMES}")
+    if not artifacts_dir:
+        raise ValueError("onnx-int8 runtime needs a directory for the exported model")
+
+    target = quantization or quantization_target()
+    out = _export_dir(model_name, artifacts_dir, target)
+    file_name = f"onnx/model_qint8_{target}.onnx"
+    if not (out / file_name).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"Exporting {model_name} to ONNX with int8 quantization ({target}) under {out} ...")
+        model = SentenceTransformer(model_name, backend="onnx", device="cpu")   # exports onnx/model.onnx
+        model.save(str(out))
+        export_dynamic_quantized_onnx_model(model, quantization_config=target, model_name_or_path=str(out))
+    return SentenceTransformer(str(out), backend="onnx", device="cpu", model_kwargs={"file_name": file_name})
+
+
+def load_from_cfg(model_name: str, cfg: Dict, device: Optional[str] = None):
+    emb = cfg["embedding"]
+    return load_embedding_model(model_name, emb.get("runtime", "torch"), device=device,
+                                artifacts_dir=emb.get("runtime_dir") or cfg["project"]["index_dir"],
+                                quantization=emb.get("quantization"))
+
+
+def agreement(reference, candidate, texts, batch_size: int = 32, k: int = 10) -> Dict:
+    """
+    How closely `candidate` reproduces `reference` on `texts`: cosine between paired
+    embeddings, overlap of top-k neighbours for short queries cut from the texts, and
+    encode throughput of both.
+    """
+    out = {}
+    embs = {}
+    for name, model in (("reference", reference), ("candidate", candidate)):
+        model.encode(texts[:batch_size], batch_size=batch_size)      # warm up
+        t0 = time.perf_counter()
+        embs[name] = model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+        out[f"{name}_texts_per_s"] = len(texts) / (time.perf_counter() - t0)
+    cos = np.sum(embs["reference"] * embs["candidate"], axis=1)
+    out.update(texts=len(texts), cosine_mean=float(cos.mean()), cosine_min=float(cos.min()),
+               cosine_p5=float(np.percentile(cos, 5)))
+    queries = [" ".join(t.split()[:12]) for t in texts[:min(64, len(texts))]]
+    kk = min(k, len(texts))
+    tops = {}
+    for name, model in (("reference", reference), ("candidate", candidate)):
+        q = model.encode(queries, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+        tops[name] = np.argsort(-(q @ embs[name].T), axis=1)[:, :kk]
+    out[f"top{kk}_overlap"] = float(np.mean([len(set(a) & set(b)) / kk for a, b in zip(tops["reference"], tops["candidate"])]))
+    return out
@@ -1,8 +1,13 @@
 # ragassist/ingestion/file_loader.py
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Iterable, Set
+from typing import List, Iterable, Iterator, Optional, Set
 import os
+import queue
+import stat
+from ..tracing import span
+from .gitignore import IgnoreStack
 
 @dataclass
 class FileDescriptor:
@@ -11,6 +16,8 @@ class FileDescriptor:
     modified_ts: float
     project_id: str
     relpath: str
+    size: int = 0
+    content_hash: str = ""
 
 _CODE_EXTS: Set[str] = {".py", ".c", ".cpp", ".h", ".hpp", ".js", ".ts", ".java", ".rs", ".go"}
 
@@ -39,42 +46,149 @@ def _normalize_exts(items: Iterable[str]) -> Set[str]:
     return out
 
 class FileLoader:
-    def __init__(self, root_dir: str, includes: List[str], excludes: List[str], project_id: str, follow_symlinks=False):
+    def __init__(self, root_dir: str, includes: List[str], excludes: List[str], project_id: str, follow_symlinks=False,
+                 gitignore: bool = True, workers: int = 8):
         self.root = Path(root_dir).resolve()
         # Match by extension ONLY
         self.include_exts: Set[str] = _normalize_exts(includes) or {
             ".py", ".cpp", ".c", ".h", ".hpp", ".md", ".pdf", ".txt"
         }
-        # Excludes here remain path-based substring checks for simplicity
+        # excluded names are pruned wherever they occur, before the walker descends into them
         self.exclude_tokens: Set[str] = {".git", "node_modules"} | {e.strip() for e in (excludes or []) if e.strip()}
         self.project_id = project_id
         self.follow_symlinks = follow_symlinks
+        self.gitignore = gitignore
+        self.workers = max(1, workers)
 
-    def _is_excluded(self, rel: Path) -> bool:
-        # simple, fast: skip if any token segment matches an excluded token
-        parts = {p for p in rel.parts}
-        return any(tok in parts for tok in self.exclude_tokens)
+    @classmethod
+    def from_cfg(cls, cfg):
+        ing = cfg["ingestion"]
+        return cls(cfg["project"]["root_dir"], ing["include_globs"], ing["exclude_globs"], cfg["project"]["id"],
+                   gitignore=ing.get("gitignore", True), workers=ing.get("walk_workers", 8))
 
     def _allowed_ext(self, p: Path) -> bool:
         return p.suffix.lower() in self.include_exts
 
-    def load_files(self) -> List[FileDescriptor]:
-        files: List[FileDescriptor] = []
-        it = self.root.rglob("*") if self.follow_symlinks else (p for p in self.root.rglob("*") if not p.is_symlink())
-        for p in it:
-            if not p.is_file():
-                continue
-            rel = p.relative_to(self.root)
-            if self._is_excluded(rel):
-                continue
-            if not self._allowed_ext(p):
-                continue
-            ext = p.suffix.lower()
-            files.append(FileDescriptor(
-                path=str(p),
-                type=_detect_type(ext),
-                modified_ts=p.stat().st_mtime,
-                project_id=self.project_id,
-                relpath=str(rel),
-            ))
-        return files
+    def _ignores(self, dirpath: str, rel: str, ignores: IgnoreStack) -> IgnoreStack:
+        if not self.gitignore:
+            return ignores
+        try:
+            with open(os.path.join(dirpath, ".gitignore"), errors="ignore") as f:
+                return ignores.push(rel, f.read())
+        except OSError:
+            return ignores
+
+    def _scan(self, dirpath: str, rel: str, ignores: IgnoreStack, dirs: list, emit):
+        """List one directory: emit its files, queue the subdirectories worth descending into."""
+        try:
+            it = os.scandir(dirpath)
+        except OSError:
+            return
+        with it:
+            for entry in it:
+                name = entry.name
+                if name in self.exclude_tokens:
+                    continue
+                relpath = f"{rel}/{name}" if rel else name
+                try:
+                    if entry.is_symlink() and not self.follow_symlinks:
+                        continue
+                    is_dir = entry.is_dir()
+                    if not is_dir and not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if ignores.ignored(relpath, is_dir):
+                    continue
+                if is_dir:
+                    dirs.append((entry.path, relpath))
+                    continue
+                ext = os.path.splitext(name)[1].lower()
+                if ext not in self.include_exts:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                emit(FileDescriptor(path=entry.path, type=_detect_type(ext), modified_ts=st.st_mtime,
+                                    project_id=self.project_id, relpath=relpath, size=st.st_size))
+
+    def _walk(self, dirpath: str, rel: str, ignores: IgnoreStack, emit):
+        with span("load_files"):
+            stack = [(dirpath, rel, ignores)]
+            seen = set()
+            while stack:
+                path, r, ign = stack.pop()
+                if self.follow_symlinks:
+                    # symlinked directories can form cycles
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                ign = self._ignores(path, r, ign)
+                dirs: list = []
+                self._scan(path, r, ign, dirs, emit)
+                stack.extend((p, sub, ign) for p, sub in reversed(dirs))
+
+    def describe(self, path: str) -> Optional[FileDescriptor]:
+        """Descriptor for one path if the walker would have yielded it, else None (e.g. deleted)."""
+        path = os.path.abspath(path)
+        rel = os.path.relpath(path, self.root)
+        parts = rel.split(os.sep)
+        if rel.startswith("..") or any(part in self.exclude_tokens for part in parts):
+            return None
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in self.include_exts or (not self.follow_symlinks and os.path.islink(path)):
+            return None
+        if self.gitignore:
+            ignores, cur = IgnoreStack(), str(self.root)
+            for i, part in enumerate(parts):
+                ignores = self._ignores(cur, "/".join(parts[:i]), ignores)
+                if ignores.ignored("/".join(parts[:i + 1]), is_dir=i < len(parts) - 1):
+                    return None
+                cur = os.path.join(cur, part)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return FileDescriptor(path=path, type=_detect_type(ext), modified_ts=st.st_mtime, project_id=self.project_id,
+                              relpath="/".join(parts), size=st.st_size)
+
+    def load_files(self) -> Iterator[FileDescriptor]:
+        """
+        Stream descriptors while walking: os.scandir, excluded and git-ignored directories
+        pruned before descent, and each top-level subdirectory walked on its own thread.
+        """
+        root = str(self.root)
+        ignores = self._ignores(root, "", IgnoreStack())
+        subtrees: list = []
+        top_files: List[FileDescriptor] = []
+        self._scan(root, "", ignores, subtrees, top_files.append)
+        yield from top_files
+        if not subtrees:
+            return
+        out: "queue.Queue[Optional[FileDescriptor]]" = queue.Queue()
+        done = object()
+
+        def walk(path, rel):
+            try:
+                self._walk(path, rel, ignores, out.put)
+            finally:
+                out.put(done)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(subtrees)), thread_name_prefix="walk") as pool:
+            futures = [pool.submit(walk, path, rel) for path, rel in subtrees]
+            remaining = len(subtrees)
+            while remaining:
+                item = out.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+            for f in futures:
+                f.result()
@@ -0,0 +1,79 @@
+# ragassist/ingestion/gitignore.py
+import re
+from typing import List, Optional, Tuple
+
+Rule = Tuple[re.Pattern, bool, bool]     # (pattern, negated, directories only)
+
+
+def _translate(pat: str) -> str:
+    # gitignore glob -> regex over a '/'-separated path relative to the .gitignore's directory
+    out, i = [], 0
+    while i < len(pat):
+        c = pat[i]
+        if pat.startswith("**/", i):
+            out.append("(?:.*/)?"); i += 3; continue
+        if pat.startswith("/**", i) and i + 3 == len(pat):
+            out.append("/.*"); i += 3; continue
+        if pat.startswith("**", i):
+            out.append(".*"); i += 2; continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pat.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pat[i + 1:j]
+                out.append("[" + ("^" + body[1:] if body[:1] == "!" else body) + "]")
+                i = j
+        elif c == "\\" and i + 1 < len(pat):
+            i += 1
+            out.append(re.escape(pat[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse(text: str) -> List[Rule]:
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        neg = line.startswith("!")
+        if neg:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # a slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in line
+        body = _translate(line.lstrip("/"))
+        rules.append((re.compile(("^" if anchored else "^(?:.*/)?") + body + "$"), neg, dir_only))
+    return rules
+
+
+class IgnoreStack:
+    """The .gitignore rules in effect for one directory: its own plus its ancestors' (immutable)."""
+    def __init__(self, layers: Tuple = ()):
+        self.layers = layers            # ((base relpath, rules), ...) outermost first
+
+    def push(self, base: str, text: str) -> "IgnoreStack":
+        rules = parse(text)
+        return IgnoreStack(self.layers + ((base, rules),)) if rules else self
+
+    def ignored(self, relpath: str, is_dir: bool) -> bool:
+        # last matching rule wins, deeper .gitignore files after shallower ones
+        verdict: Optional[bool] = None
+        for base, rules in self.layers:
+            sub = relpath[len(base) + 1:] if base else relpath
+            for pat, neg, dir_only in rules:
+                if dir_only and not is_dir:
+                    continue
+                if pat.match(sub):
+                    verdict = not neg
+        return bool(verdict)
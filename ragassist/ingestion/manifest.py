@@ -0,0 +1,158 @@
+# ragassist/ingestion/manifest.py
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .chunker import CHUNKER_VERSION
+from .embedding_runtime import runtime_tag
+from .file_loader import FileDescriptor
+
+MANIFEST_NAME = "manifest.json"
+VERSION_NAME = "INDEX_VERSION"
+
+
+def file_hash(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_index_version(index_dir: str) -> str:
+    try:
+        return (Path(index_dir) / VERSION_NAME).read_text().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_index_version(index_dir: str) -> str:
+    """Stamp the index as changed; readers (e.g. the answer cache) compare stamps to invalidate."""
+    version = uuid.uuid4().hex
+    path = Path(index_dir) / VERSION_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(version)
+    os.replace(tmp, path)
+    return version
+
+
+def settings_fingerprint(cfg: Dict) -> str:
+    """
+    Hash of the settings that shape chunk IDs, vectors and where they are stored. If any
+    of them change, every file has to be re-processed even when its content did not.
+    """
+    relevant = {"chunking": cfg.get("chunking", {}),
+                "vector_store": cfg.get("vector_store", {}),
+                "bm25": cfg.get("bm25", {}),
+                "text_model": cfg.get("embedding", {}).get("text_model"),
+                "code_model": cfg.get("embedding", {}).get("code_model"),
+                "dedup": cfg.get("dedup", {}),
+                "chunker": CHUNKER_VERSION}
+    tag = runtime_tag(cfg.get("embedding", {}))
+    if tag:
+        relevant["runtime"] = tag
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+class IngestManifest:
+    """
+    Persistent record of what is in the index: path -> {mtime, size, sha256, chunk_ids}.
+    Lives next to the indices so it always describes the stores it sits with. With
+    deduplication several files can list the same (canonical) chunk ID, so chunks are
+    reference-counted and only leave the stores with their last file.
+    """
+    def __init__(self, index_dir: str, fingerprint: str = ""):
+        self.path = Path(index_dir) / MANIFEST_NAME
+        self.fingerprint = fingerprint
+        self.files: Dict[str, Dict] = {}
+        self._stored_fingerprint = fingerprint
+        self._seen = set()
+        self._loaded = self.path.exists()
+        if self._loaded:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self._stored_fingerprint = data.get("fingerprint", "")
+        self._refs = Counter(cid for e in self.files.values() for cid in e["chunk_ids"])
+        self._lock = threading.Lock()
+
+    @property
+    def usable(self) -> bool:
+        """
+        Whether the stores can be updated incrementally from this manifest. Without it (an
+        index built by a version before manifests existed) or under other settings, chunks
+        it does not list would never be deleted, so the stores have to be rebuilt.
+        """
+        return self._loaded and self._stored_fingerprint == self.fingerprint
+
+    def clear(self):
+        """Forget every file, e.g. after the stores were emptied."""
+        self.files, self._refs = {}, Counter()
+        self._stored_fingerprint, self._loaded = self.fingerprint, True
+
+    def check(self, fd: FileDescriptor) -> Tuple[bool, List[str]]:
+        """
+        Decide whether a discovered file needs (re)ingesting. Returns the flag and the
+        chunk IDs of its previous version, which must leave the stores before the new
+        ones go in. Unchanged files are skipped by mtime/size first and by content hash
+        when only the mtime moved. Raises OSError when the file cannot be read.
+        """
+        reuse = self._stored_fingerprint == self.fingerprint
+        entry = self.files.get(fd.path)
+        if entry and reuse and entry["mtime"] == fd.modified_ts and entry["size"] == fd.size:
+            self._seen.add(fd.path)
+            return False, []
+        # OSError (file gone or unreadable since it was listed) leaves the path unseen
+        fd.content_hash = file_hash(fd.path)
+        self._seen.add(fd.path)
+        if entry and reuse and entry["sha256"] == fd.content_hash:
+            # touched but unchanged: refresh stat info, keep chunks
+            entry["mtime"], entry["size"] = fd.modified_ts, fd.size
+            return False, []
+        return True, self.drop(fd.path)
+
+    def removed(self) -> List[str]:
+        """Manifest paths not seen by check() since load, i.e. deleted from disk."""
+        return [p for p in list(self.files) if p not in self._seen]
+
+    def drop(self, path: str) -> List[str]:
+        """Forget a file and return the chunk IDs that belonged to it."""
+        entry = self.files.pop(path, None)
+        if not entry:
+            return []
+        with self._lock:
+            for cid in entry["chunk_ids"]:
+                self._refs[cid] -= 1
+                if self._refs[cid] <= 0:
+                    del self._refs[cid]
+        return entry["chunk_ids"]
+
+    def referenced(self, ids: Iterable[str]) -> Set[str]:
+        """The IDs some file in the manifest still lists."""
+        with self._lock:
+            return {cid for cid in ids if cid in self._refs}
+
+    def refers(self, path: str, chunk_id: str) -> bool:
+        return chunk_id in self.files.get(path, {}).get("chunk_ids", ())
+
+    def record(self, fd: FileDescriptor, chunk_ids: List[str]):
+        self.drop(fd.path)
+        with self._lock:
+            self._refs.update(chunk_ids)
+        self.files[fd.path] = {"mtime": fd.modified_ts, "size": fd.size,
+                               "sha256": fd.content_hash or file_hash(fd.path),
+                               "chunk_ids": list(chunk_ids)}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "files": self.files}, f)
+        os.replace(tmp, self.path)
+        self._stored_fingerprint = self.fingerprint
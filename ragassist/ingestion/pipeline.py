@@ -0,0 +1,350 @@
+# ragassist/ingestion/pipeline.py
+"""
+Streaming ingest: discovery -> extract/chunk (N workers) -> dedup + embed -> index write.
+Stages are threads joined by bounded queues, so extraction, embedding and index
+writes overlap and only a few batches are ever held in memory at once.
+"""
+import contextlib
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..mytypes import Chunk
+from .chunker import CHARS_PER_TOKEN
+from .file_loader import FileDescriptor
+from .manifest import IngestManifest, bump_index_version
+from .preprocess import extract_text
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0          # files for discover/extract/chunk, chunks for embed/write
+    busy_s: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.busy_s if self.busy_s > 0 else 0.0
+
+
+@dataclass
+class _FileWork:
+    fd: FileDescriptor
+    stale_ids: List[str]
+    chunks: List[Chunk] = field(default_factory=list)
+    chunk_ids: List[str] = field(default_factory=list)   # what the manifest lists: canonical IDs for duplicates
+    failed: bool = False
+
+
+class IngestPipeline:
+    def __init__(self, chunker, make_embedder: Callable, vec, bm25, docs, manifest: IngestManifest,
+                 workers: int = 2, batch_size: int = 256, pdf_extractor=None,
+                 progress: Optional[Callable[[Dict[str, StageStats]], None]] = None,
+                 progress_every: float = 5.0, optimize: bool = True, deduper=None):
+        self.chunker = chunker
+        self.make_embedder = make_embedder
+        self.vec = vec
+        self.bm25 = bm25
+        self.docs = docs
+        self.manifest = manifest
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.pdf_extractor = pdf_extractor
+        self.progress = progress
+        self.progress_every = progress_every
+        self.optimize = optimize      # let stores merge/compact when the writer session ends
+        self.deduper = deduper
+        self.duplicates = {"exact": 0, "near": 0, "chars": 0}
+        self._pins: Counter = Counter()   # canonicals that duplicates in flight point at: never deleted meanwhile
+        self.stats: Dict[str, StageStats] = {n: StageStats(n) for n in
+                                             ("discover", "extract", "chunk", "embed", "write")}
+        self.errors: List[str] = []
+        self.removed_chunks = 0
+        self.unchanged_files = 0
+        self.embedder = None
+        self._changed = False
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+        self._fatal: Optional[BaseException] = None
+
+    # -- queue helpers: never block forever once another stage has failed
+    def _put(self, q: queue.Queue, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _guard(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as exc:
+            self._fatal = self._fatal or exc
+            self._abort.set()
+
+    # -- stages
+    def _discover(self, files: Iterable[FileDescriptor], q_out: queue.Queue):
+        st = self.stats["discover"]
+        t0 = time.perf_counter()
+        for fd in files:
+            if self._abort.is_set():
+                break
+            st.items += 1
+            try:
+                todo, stale_ids = self.manifest.check(fd)
+            except OSError as exc:
+                # deleted or made unreadable after the walk listed it: handled like a removed file
+                with self._lock:
+                    self.errors.append(f"{fd.path}: {exc}")
+                continue
+            if todo:
+                self._put(q_out, _FileWork(fd, stale_ids))
+            else:
+                self.unchanged_files += 1
+            st.busy_s = time.perf_counter() - t0
+        for _ in range(self.workers):
+            self._put(q_out, _DONE)
+
+    def _extract(self, q_in: queue.Queue, q_out: queue.Queue):
+        st_x, st_c = self.stats["extract"], self.stats["chunk"]
+        while True:
+            work = self._get(q_in)
+            if work is _DONE:
+                break
+            try:
+                t0 = time.perf_counter()
+                text = extract_text(work.fd.path, work.fd.type, self.pdf_extractor, work.fd.content_hash)
+                t1 = time.perf_counter()
+                work.chunks = self.chunker.chunk(text, work.fd.path, work.fd.type)
+                t2 = time.perf_counter()
+                with self._lock:
+                    st_x.items += 1; st_x.busy_s += t1 - t0
+                    st_c.items += 1; st_c.busy_s += t2 - t1
+            except Exception as exc:
+                # still forwarded so its stale chunks get removed; not recorded, so retried next run
+                work.failed = True
+                with self._lock:
+                    self.errors.append(f"{work.fd.path}: {exc}")
+            self._put(q_out, work)
+        self._put(q_out, _DONE)
+
+    def _embed(self, q_in: queue.Queue, q_out: queue.Queue):
+        st = self.stats["embed"]
+        pending: List[_FileWork] = []
+        n_pending = 0
+        finished = 0
+        while finished < self.workers:
+            work = self._get(q_in)
+            if work is _DONE:
+                if self._abort.is_set():
+                    return
+                finished += 1
+            else:
+                pending.append(work)
+                n_pending += len(work.chunks)
+            # whole files per batch so the writer can record them in the manifest
+            if pending and (n_pending >= self.batch_size or finished == self.workers):
+                chunks, dups = self._dedup(pending)
+                embs = None
+                if chunks:
+                    t0 = time.perf_counter()
+                    if self.embedder is None:
+                        self.embedder = self.make_embedder()
+                    embs = self.embedder.embed_batch(chunks)["embeddings"]
+                    st.items += len(chunks); st.busy_s += time.perf_counter() - t0
+                self._put(q_out, (pending, chunks, embs, dups))
+                pending, n_pending = [], 0
+        self._put(q_out, _DONE)
+
+    def _dedup(self, works: List[_FileWork]) -> Tuple[List[Chunk], List[Tuple[Chunk, str]]]:
+        """Canonical chunks to embed and write, and (duplicate, canonical ID) pairs."""
+        chunks = [c for w in works for c in w.chunks]
+        found = [None] * len(chunks)
+        if self.deduper and chunks:
+            # old versions the writer is about to delete must not become canonical for their own
+            # replacements (an edited chunk is usually a near duplicate of what it replaces)
+            stale = [cid for w in works for cid in w.stale_ids]
+            with self._lock:
+                keep = self.manifest.referenced(stale) | {cid for cid in stale if self._pins[cid] > 0}
+            found = self.deduper.resolve(chunks, exclude={cid for cid in stale if cid not in keep})
+        canonical, dups, it = [], [], iter(found)
+        for w in works:
+            w.chunk_ids = []
+            for c in w.chunks:
+                hit = next(it)
+                if hit is None:
+                    canonical.append(c)
+                    w.chunk_ids.append(c.id)
+                    continue
+                dups.append((c, hit[0]))
+                w.chunk_ids.append(hit[0])
+                with self._lock:
+                    self._pins[hit[0]] += 1
+                    self.duplicates[hit[1]] += 1
+                    self.duplicates["chars"] += len(c.text)
+        return canonical, dups
+
+    def _write(self, q_in: queue.Queue):
+        # one bulk session per run: stores buffer across batches and commit once at the end
+        with contextlib.ExitStack() as sessions:
+            for store in (self.vec, self.bm25):
+                if hasattr(store, "bulk"):
+                    sessions.enter_context(store.bulk(optimize=self.optimize))
+            self._write_batches(q_in)
+            t0 = time.perf_counter()
+        # the final commit/merge is write time too
+        self.stats["write"].busy_s += time.perf_counter() - t0
+
+    def _write_batches(self, q_in: queue.Queue):
+        st = self.stats["write"]
+        while True:
+            item = self._get(q_in)
+            if item is _DONE:
+                break
+            works, chunks, embs, dups = item
+            t0 = time.perf_counter()
+            self._touch()
+            # old versions first: unchanged chunks of a modified file keep their IDs
+            stale = [cid for w in works for cid in w.stale_ids]
+            self._delete(stale, {w.fd.path for w in works})
+            if chunks:
+                self._keep_locations(chunks)
+                self.docs.put(chunks)
+                self.vec.add(chunks, embs)
+                if self.bm25: self.bm25.add(chunks)
+                if self.deduper: self.deduper.add(chunks)
+            for w in works:
+                if not w.failed:
+                    self.manifest.record(w.fd, w.chunk_ids)
+            if dups:
+                self._add_locations(dups)
+            st.items += len(chunks); st.busy_s += time.perf_counter() - t0
+
+    def _touch(self):
+        # stamp before the first write so nothing cached against the old index survives it
+        if not self._changed:
+            self._changed = True
+            bump_index_version(self.manifest.path.parent)
+
+    def _delete(self, ids: List[str], paths=()):
+        """Remove chunks `paths` no longer list, unless another file still shares them."""
+        if not ids:
+            return
+        self._touch()
+        with self._lock:
+            keep = self.manifest.referenced(ids) | {cid for cid in ids if self._pins[cid] > 0}
+        gone = list(dict.fromkeys(cid for cid in ids if cid not in keep))
+        if gone:
+            self.vec.delete(gone)
+            if self.bm25: self.bm25.delete(gone)
+            self.docs.delete(gone)
+            if self.deduper: self.deduper.remove(gone)
+            self.removed_chunks += len(gone)
+        if keep and paths:
+            self._drop_locations(list(keep), set(paths))
+
+    # -- locations of shared chunks: meta["also_in"] = [{"file", "pos"}, ...] besides file_path/position
+    def _drop_locations(self, ids: List[str], paths):
+        changed = []
+        for c in self.docs.get_many(ids).values():
+            alts = [a for a in c.meta.get("also_in", []) if a["file"] not in paths]
+            if c.file_path in paths and alts:
+                # its file dropped the text but others still have it: one of them becomes the primary
+                c.file_path, c.position = alts[0]["file"], alts[0]["pos"]
+                alts = alts[1:]
+            if alts != c.meta.get("also_in", []):
+                c.meta["also_in"] = alts
+                changed.append(c)
+        if changed:
+            self.docs.put(changed)
+
+    def _keep_locations(self, chunks: List[Chunk]):
+        # a rewritten canonical keeps the alternate locations recorded for it so far
+        old = self.docs.get_many([c.id for c in chunks])
+        for c in chunks:
+            prev = old.get(c.id)
+            if prev is None:
+                continue
+            locs = [{"file": prev.file_path, "pos": prev.position}] + prev.meta.get("also_in", [])
+            alts = [a for a in locs if (a["file"], a["pos"]) != (c.file_path, c.position)]
+            if alts:
+                c.meta["also_in"] = alts
+
+    def _add_locations(self, dups: List[Tuple[Chunk, str]]):
+        canon = self.docs.get_many(list({cid for _, cid in dups}))
+        for d, cid in dups:
+            c = canon.get(cid)
+            if c is None:
+                continue
+            loc = {"file": d.file_path, "pos": d.position}
+            alts = c.meta.setdefault("also_in", [])
+            if not self.manifest.refers(c.file_path, cid):
+                # primary location left over from a file that no longer has this text
+                c.file_path, c.position = d.file_path, d.position
+                alts[:] = [a for a in alts if a != loc]
+            elif loc not in alts and (c.file_path, c.position) != (d.file_path, d.position):
+                alts.append(loc)
+        self.docs.put(list(canon.values()))
+        with self._lock:
+            for _, cid in dups:
+                self._pins[cid] -= 1
+                if self._pins[cid] <= 0:
+                    del self._pins[cid]
+
+    def _monitor(self, done: threading.Event):
+        while not done.wait(self.progress_every):
+            self.progress(self.stats)
+
+    def run(self, files: Iterable[FileDescriptor], removed: Optional[List[str]] = None) -> Dict[str, StageStats]:
+        """
+        Ingest `files`. Manifest entries for `removed` paths are dropped with their chunks;
+        by default that is every path the run did not see, i.e. `files` is the whole tree.
+        """
+        q_files = queue.Queue(maxsize=self.workers * 4)
+        q_chunks = queue.Queue(maxsize=self.workers * 2)
+        q_embs = queue.Queue(maxsize=2)
+        threads = [threading.Thread(target=self._guard, args=(self._discover, files, q_files), daemon=True)]
+        threads += [threading.Thread(target=self._guard, args=(self._extract, q_files, q_chunks), daemon=True)
+                    for _ in range(self.workers)]
+        threads += [threading.Thread(target=self._guard, args=(self._embed, q_chunks, q_embs), daemon=True),
+                    threading.Thread(target=self._guard, args=(self._write, q_embs), daemon=True)]
+        done = threading.Event()
+        if self.progress:
+            threading.Thread(target=self._monitor, args=(done,), daemon=True).start()
+        for t in threads: t.start()
+        for t in threads: t.join()
+        done.set()
+        if self._fatal is not None:
+            raise self._fatal
+
+        # files gone from disk; their IDs embed their path so they never clash with new chunks
+        gone = self.manifest.removed() if removed is None else removed
+        self._delete([cid for p in gone for cid in self.manifest.drop(p)], gone)
+        self.manifest.save()
+        if self._changed:
+            bump_index_version(self.manifest.path.parent)
+        return self.stats
+
+
+def format_stats(stats: Dict[str, StageStats]) -> str:
+    return "  ".join(f"{s.name}: {s.items} ({s.rate:.1f}/s)" for s in stats.values())
+
+
+def format_duplicates(dup: Dict[str, int]) -> str:
+    n = dup["exact"] + dup["near"]
+    return (f"deduplicated {n} chunks ({dup['exact']} exact, {dup['near']} near): "
+            f"~{int(dup['chars'] / CHARS_PER_TOKEN)} tokens not embedded or indexed")
@@ -1,32 +1,112 @@
+import multiprocessing
 import os
-import fitz  # PyMuPDF
-import pymupdf4llm as pdf
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from pathlib import Path
-from llama_index.readers.file import PDFReader, FlatReader
+from typing import List, Optional
+from .manifest import file_hash
+from ..tracing import traced
 
+# PyMuPDF / pymupdf4llm are imported where used: they are slow to import and most
+# commands (and text-only corpora) never touch a PDF.
 
-def extract_text(fpath: str, ftype: str) -> str:
+
+@traced("extract_text")
+def extract_text(fpath: str, ftype: str, extractor: Optional["PdfExtractor"] = None, digest: str = "") -> str:
     """Extract text from a file.
 
     Args:
         fpath: Path to the file.
         ftype: File extension/type (e.g. 'pdf', 'txt').
+        extractor: Optional shared PdfExtractor (process pool + cache) for PDFs.
+        digest: Content hash of the file if already known, used as the cache key.
 
     Returns:
         Extracted text as a string.
     """
     if ftype == "pdf":
-        return _pdf_to_text(fpath)
+        return extractor.extract(fpath, digest) if extractor else _pdf_to_text(fpath)
     # naive text load; code kept as-is for chunker
     return Path(fpath).read_text(errors="ignore")
 
 
-def _pdf_to_text(fpath: str) -> str:
-    doc = pdf.to_markdown(fpath)
+def _pdf_to_text(fpath: str, pages: Optional[List[int]] = None) -> str:
+    import pymupdf4llm as pdf
+    doc = pdf.to_markdown(fpath, pages=pages)
     return doc
 
+
+class ExtractionCache:
+    """Extracted markdown on disk, keyed by file content hash and extractor version."""
+    def __init__(self, cache_dir: str):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    @cached_property
+    def version(self) -> str:
+        # first looked up by the first PDF, so text-only runs work without pymupdf4llm installed
+        import pymupdf4llm as pdf
+        return getattr(pdf, "__version__", "0")
+
+    def _path(self, digest: str) -> Path:
+        return self.dir / digest[:2] / f"{digest}-{self.version}.md"
+
+    def get(self, digest: str) -> Optional[str]:
+        p = self._path(digest)
+        return p.read_text(encoding="utf-8") if p.exists() else None
+
+    def put(self, digest: str, text: str):
+        p = self._path(digest)
+        p.parent.mkdir(exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, p)
+
+
+class PdfExtractor:
+    """
+    Runs pymupdf4llm in a process pool. Small PDFs go to the pool whole; large ones are
+    split into page ranges converted in parallel and stitched back in page order.
+    Safe to share between threads.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, workers: Optional[int] = None, pages_per_task: int = 16):
+        # spawn, not fork: the pipeline's threads (and maybe torch) are already running here
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        self.cache = ExtractionCache(cache_dir) if cache_dir else None
+        self.pages_per_task = pages_per_task
+
+    def extract(self, fpath: str, digest: str = "") -> str:
+        if self.cache:
+            digest = digest or file_hash(fpath)
+            text = self.cache.get(digest)
+            if text is not None:
+                return text
+        import fitz  # PyMuPDF
+        with fitz.open(fpath) as doc:
+            n_pages = doc.page_count
+        if n_pages <= self.pages_per_task:
+            text = self.pool.submit(_pdf_to_text, fpath).result()
+        else:
+            futures = [self.pool.submit(_pdf_to_text, fpath, list(range(i, min(i + self.pages_per_task, n_pages))))
+                       for i in range(0, n_pages, self.pages_per_task)]
+            text = "".join(f.result() for f in futures)
+        if self.cache:
+            self.cache.put(digest, text)
+        return text
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 if __name__ == "__main__":
     import argparse
+    from llama_index.readers.file import PDFReader
 
     parser = argparse.ArgumentParser(description="Test the extract_text function on a file.")
     parser.add_argument("--fpath", type=str, default="./rag_test/paper/2509.25122v1.pdf", help="Path to input file (PDF or text).")
@@ -0,0 +1,119 @@
+# ragassist/ingestion/watcher.py
+"""
+Change notification for `ragassist watch`. Uses watchdog (inotify/FSEvents/kqueue)
+when it is installed and falls back to polling with the pruning walker otherwise.
+Events are debounced into batches of touched paths; a renamed, moved or removed directory
+stands for every file under it.
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .file_loader import FileLoader
+
+
+class Watcher:
+    def __init__(self, loader: FileLoader, debounce_s: float = 1.0, poll_s: float = 2.0, max_delay_s: float = 10.0,
+                 backend: str = "auto"):
+        self.loader = loader
+        self.debounce_s = debounce_s
+        self.poll_s = poll_s
+        self.max_delay_s = max_delay_s       # a steady stream of edits still flushes this often
+        self.backend = backend
+        self._events: "queue.Queue[str]" = queue.Queue()
+
+    def _relevant(self, path: str) -> bool:
+        # cheap pre-filter so .git churn and build output never reach the batch
+        rel = os.path.relpath(path, self.loader.root)
+        return not rel.startswith("..") and not any(part in self.loader.exclude_tokens for part in rel.split(os.sep))
+
+    def _push(self, path: str):
+        if self._relevant(path):
+            self._events.put(path)
+
+    def _start_watchdog(self, stop: threading.Event) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler  # optional dependency
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+        push = self._push
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # a directory's own "modified" events only echo changes to its files
+                if event.is_directory and event.event_type not in ("created", "deleted", "moved"):
+                    return
+                push(event.src_path)
+                if getattr(event, "dest_path", ""):
+                    push(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.loader.root), recursive=True)
+        observer.daemon = True
+        observer.start()
+        threading.Thread(target=lambda: (stop.wait(), observer.stop()), daemon=True).start()
+        return True
+
+    def expand(self, paths: List[str], known: Iterable[str]) -> List[str]:
+        """
+        Replace each directory path in a batch with the files under it: the `known` (indexed)
+        ones below that prefix, which are gone if the directory moved away, and the ones on
+        disk, which are new if it moved here. File paths pass through unchanged.
+        """
+        known = set(known)
+        out = set()
+        for p in paths:
+            if p in known or os.path.isfile(p):
+                out.add(p)
+                continue
+            prefix = p.rstrip(os.sep) + os.sep
+            under = [k for k in known if k.startswith(prefix)]
+            out.update(under)
+            if os.path.isdir(p):
+                for dirpath, dirnames, filenames in os.walk(p, followlinks=self.loader.follow_symlinks):
+                    dirnames[:] = [d for d in dirnames if d not in self.loader.exclude_tokens]
+                    out.update(os.path.join(dirpath, f) for f in filenames)
+            elif not under:
+                out.add(p)          # a deleted file that was never indexed
+        return sorted(out)
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        return {fd.path: (fd.modified_ts, fd.size) for fd in self.loader.load_files()}
+
+    def _poll(self, stop: threading.Event):
+        before = self._snapshot()
+        while not stop.wait(self.poll_s):
+            after = self._snapshot()
+            for path in before.keys() | after.keys():
+                if before.get(path) != after.get(path):
+                    self._events.put(path)
+            before = after
+
+    def start(self, stop: threading.Event) -> str:
+        """Begin collecting events; returns the backend in use."""
+        if self.backend != "poll" and self._start_watchdog(stop):
+            return "watchdog"
+        threading.Thread(target=self._poll, args=(stop,), daemon=True).start()
+        return "poll"
+
+    def run(self, on_batch: Callable[[List[str]], None], stop: threading.Event):
+        """After start(): call on_batch(paths) whenever edits pause for debounce_s, until `stop` is set."""
+        pending, first, last = set(), 0.0, 0.0
+        while not stop.is_set():
+            got = False
+            try:
+                pending.add(self._events.get(timeout=min(0.25, self.debounce_s)))
+                got = True
+                while True:
+                    pending.add(self._events.get_nowait())
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if got:
+                last, first = now, first or now
+            if pending and (now - last >= self.debounce_s or now - first >= self.max_delay_s):
+                batch, pending, first = sorted(pending), set(), 0.0
+                on_batch(batch)
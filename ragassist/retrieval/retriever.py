@@ -1,15 +1,20 @@
 import numpy as np
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-from ..mytypes import RetrievalHit, Chunk
+from typing import List, Dict, Optional
+from ..mytypes import RetrievalHit
+from ..tracing import span, traced
 
 class Retriever:
-    def __init__(self, vector_store, bm25_store, embed_model: str, alpha_dense: float = 0.7, rrf: bool = True):
+    def __init__(self, vector_store, bm25_store, chunk_store, embed_model: str, alpha_dense: float = 0.7, rrf: bool = True,
+                 encoder=None):
         self.vs = vector_store
         self.bm25 = bm25_store
+        self.docs = chunk_store
         self.alpha = alpha_dense
         self.rrf = rrf
-        self.embedder = SentenceTransformer(embed_model)
+        if encoder is None:
+            from sentence_transformers import SentenceTransformer  # heavy: torch + transformers
+            encoder = SentenceTransformer(embed_model)
+        self.embedder = encoder  # anything with SentenceTransformer's encode()
 
     def _fuse_rrf(self, dense_hits, bm25_hits, k=8):
         # reciprocal rank fusion over chunk IDs
@@ -21,31 +26,47 @@ class Retriever:
         ids = sorted(scores.keys(), key=lambda i: scores[i], reverse=True)[:k]
         return [{"id": cid, "score": scores[cid]} for cid in ids]
 
+    def _fuse(self, dense_hits, bm25_hits, k):
+        if self.rrf and bm25_hits:
+            return self._fuse_rrf(dense_hits, bm25_hits, k=k)
+        # linear interpolate by normalized ranks
+        return (dense_hits[:k] if self.alpha >= 0.5 else bm25_hits[:k])
+
     def retrieve(self, query: str, k: int = 8) -> List[RetrievalHit]:
-        q_emb = self.embedder.encode(query, normalize_embeddings=True)
-        dense_res = self.vs.query(q_emb, k=16)
-        dense_hits = [{"id": id_, "score": s} for id_, s in zip(dense_res["ids"][0], dense_res["distances"][0])]
-        bm25_hits = self.bm25.search(query, k=16) if self.bm25 else []
+        return self.retrieve_many([query], k=k)[0]
 
-        if self.rrf and bm25_hits:
-            fused = self._fuse_rrf(dense_hits, bm25_hits, k=k)
-        else:
-            # linear interpolate by normalized ranks
-            fused = (dense_hits[:k] if self.alpha >= 0.5 else bm25_hits[:k])
-
-        # map IDs back to full chunks:
-        id_to_chunk = {doc_id: Chunk(
-            id=doc_id,
-            text=doc_text,
-            type=meta["type"],
-            file_path=meta["file_path"],
-            position=meta["position"],
-            meta=meta
-        ) for doc_id, doc_text, meta in zip(dense_res["ids"][0], dense_res["documents"][0], dense_res["metadatas"][0])}
-
-        hits = []
-        for h in fused:
-            c = id_to_chunk.get(h["id"])
-            if c:
-                hits.append(RetrievalHit(chunk=c, score=h["score"], source="fused"))
-        return hits[:k]
+    @traced("encode")
+    def encode(self, queries: List[str]) -> np.ndarray:
+        return self.embedder.encode(queries, normalize_embeddings=True, convert_to_numpy=True)
+
+    @traced("retrieve")
+    def retrieve_many(self, queries: List[str], k: int = 8, q_embs: Optional[np.ndarray] = None) -> List[List[RetrievalHit]]:
+        """One batched encode, one multi-query dense lookup and one BM25 searcher for all queries."""
+        if not queries:
+            return []
+        if q_embs is None:
+            q_embs = self.encode(queries)
+        n_cand = max(16, k)
+        dense_res = self.vs.query(q_embs, k=n_cand)
+        bm25_res = self.bm25.search_many(queries, k=n_cand) if self.bm25 else [[] for _ in queries]
+
+        with span("fuse"):
+            # every candidate is kept until hydration: a hit missing from the docstore must not cost a slot in the top k
+            fused_all = []
+            for ids, dists, bm25_hits in zip(dense_res["ids"], dense_res["distances"], bm25_res):
+                dense_hits = [{"id": id_, "score": s} for id_, s in zip(ids, dists)]
+                fused_all.append(self._fuse(dense_hits, bm25_hits, 2 * n_cand))
+
+        # hydrate hits from either source in one docstore read
+        with span("docstore.get"):
+            id_to_chunk = self.docs.get_many(list({h["id"] for fused in fused_all for h in fused}))
+
+        out = []
+        for fused in fused_all:
+            hits = []
+            for h in fused:
+                c = id_to_chunk.get(h["id"])
+                if c:
+                    hits.append(RetrievalHit(chunk=c, score=h["score"], source="fused"))
+            out.append(hits[:k])
+        return out
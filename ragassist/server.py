@@ -1,27 +1,197 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from .cli import load_cfg
-from .index.vector_store import VectorStore
-from .index.bm25_store import BM25Store
-from .retrieval.retriever import Retriever
-from .generation.context_assembler import ContextAssembler
-from .generation.llm_factory import get_model
-
-app = FastAPI()
-cfg = load_cfg("configs/default.yaml")
-vec = VectorStore(cfg["vector_store"]["collection"], cfg["project"]["index_dir"])
-bm25 = BM25Store(cfg["project"]["index_dir"]) if cfg["bm25"]["enabled"] else None
-retr = Retriever(vec, bm25, embed_model=cfg["embedding"]["text_model"], alpha_dense=cfg["retrieval"]["alpha_dense"], rrf=cfg["retrieval"]["rrf"])
-llm = get_model(cfg["llm"])
-assembler = ContextAssembler()
+from .assistant import Assistant, hits_json
+from .session.chat import SessionStore
+from . import tracing
+
+# built in the startup hook, not at import: loading models and opening indices takes seconds
+cfg = None
+assistant: Assistant = None
+sessions: SessionStore = None
+retrieval_pool: ThreadPoolExecutor = None
+generation_pool: ThreadPoolExecutor = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global cfg, assistant, sessions, retrieval_pool, generation_pool
+    cfg = load_cfg(os.environ.get("RAGASSIST_CONFIG", "configs/default.yaml"))
+    tracing.enable(cfg.get("tracing", {}).get("enabled", True))
+    t0 = time.perf_counter()
+    assistant = Assistant(cfg)
+    # first encode/query pays for lazy model and index initialization; do it before serving
+    assistant.warm_up()
+    sessions = SessionStore.from_cfg(cfg, assistant.new_session)
+    print(f"ragassist server ready in {time.perf_counter() - t0:.1f}s")
+    # retrieval is CPU-bound (encode + index scans): small pool; LLM calls mostly wait on I/O: larger pool
+    srv_cfg = cfg.get("server", {})
+    retrieval_pool = ThreadPoolExecutor(max_workers=srv_cfg.get("retrieval_workers", 4), thread_name_prefix="retrieve")
+    generation_pool = ThreadPoolExecutor(max_workers=srv_cfg.get("generation_workers", 32), thread_name_prefix="generate")
+    yield
+    retrieval_pool.shutdown(wait=False, cancel_futures=True)
+    generation_pool.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(lifespan=lifespan)
 
 class Query(BaseModel):
     query: str
+    timings: bool = False   # include a per-stage breakdown (seconds) in the response
+
+class Queries(BaseModel):
+    queries: List[str]
+
+def _start(question: str):
+    return assistant.start_many([question])[0]
+
+def _answer(p):
+    # planning (waiting on the reformulation) runs here, on the generation pool, not in retrieval
+    resp = assistant.answer(p)
+    return {"answer": resp.answer, "hits": hits_json(p.hits), "cached": p.cached is not None}
+
+def _plan_and_stream(p):
+    raw = p.hits
+    assistant.plan(p)
+    if p.hits is not raw:
+        yield "sources", hits_json(p.hits)      # re-retrieved with the reformulated question
+    for piece in assistant.answer_stream(p):
+        yield "token", {"text": piece}
+
+async def _run(pool, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+def _timed(fn, *args):
+    # collect on the worker thread: run_in_executor does not carry the caller's context
+    with tracing.collect() as t:
+        return fn(*args), t
+
+async def _iterate_in_thread(pool, gen_fn, *args):
+    """Drive a blocking generator on `pool`, yielding its items to the event loop as they arrive."""
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for item in gen_fn(*args):
+                loop.call_soon_threadsafe(q.put_nowait, item)
+        except Exception as exc:
+            loop.call_soon_threadsafe(q.put_nowait, exc)
+        finally:
+            loop.call_soon_threadsafe(q.put_nowait, done)
+
+    fut = loop.run_in_executor(pool, pump)
+    while True:
+        item = await q.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    await fut
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.post("/ask")
-def ask(q: Query):
-    hits = retr.retrieve(q.query, k=cfg["retrieval"]["top_k"])
-    ctx = assembler.build(q.query, hits)
-    system = cfg["prompting"]["system_message"]
-    resp = llm.generate(system, f"[Context]\n{ctx}\n\n[Task] {q.query}", cfg["llm"]["max_output_tokens"], cfg["llm"]["temperature"])
-    return {"answer": resp.answer, "hits": [{"file": h.chunk.file_path, "pos": h.chunk.position, "score": h.score} for h in hits]}
+async def ask(q: Query):
+    if not q.timings:
+        p = await _run(retrieval_pool, _start, q.query)
+        if p.cached is not None:
+            return _answer(p)
+        return await _run(generation_pool, _answer, p)
+    t0 = time.perf_counter()
+    p, timings = await _run(retrieval_pool, _timed, _start, q.query)
+    out, gen_timings = await _run(generation_pool, _timed, _answer, p)
+    for name, secs in gen_timings.items():
+        timings[name] = timings.get(name, 0.0) + secs
+    timings["total"] = time.perf_counter() - t0
+    return {**out, "timings": timings}
+
+@app.post("/ask/stream")
+async def ask_stream(q: Query):
+    """
+    Server-sent events: `sources` as soon as raw-question retrieval is done (again if the
+    reformulated question retrieves different ones), then `token`s, then `done`.
+    """
+    p = await _run(retrieval_pool, _start, q.query)
+
+    async def events():
+        yield _sse("sources", hits_json(p.hits))
+        try:
+            async for event, data in _iterate_in_thread(generation_pool, _plan_and_stream, p):
+                yield _sse(event, data)
+        except Exception as exc:
+            yield _sse("error", {"message": str(exc)})
+        yield _sse("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/retrieve_batch")
+async def retrieve_batch(q: Queries):
+    all_hits = await _run(retrieval_pool, assistant.retriever.retrieve_many, q.queries, assistant.k)
+    return {"results": [{"query": query, "hits": hits_json(hits)} for query, hits in zip(q.queries, all_hits)]}
+
+@app.post("/ask_batch")
+async def ask_batch(q: Queries):
+    # retrieval is batched; generations run concurrently, one per question
+    prepared = await _run(retrieval_pool, assistant.start_many, q.queries)
+    answers = await asyncio.gather(*(_run(generation_pool, _answer, p) for p in prepared))
+    return {"results": [{"query": query, **ans} for query, ans in zip(q.queries, answers)]}
+
+def _chat(session_id: str, query: str):
+    s = sessions.get(session_id)
+    resp, hits = assistant.chat(s, query)
+    return {"session_id": s.id, "answer": resp.answer, "hits": hits_json(hits), "session": s.stats()}
+
+@app.post("/chat/{session_id}")
+async def chat(session_id: str, q: Query):
+    """One turn of the conversation `session_id` (created on first use); history and sources carry over."""
+    if not q.timings:
+        return await _run(generation_pool, _chat, session_id, q.query)
+    t0 = time.perf_counter()
+    out, timings = await _run(generation_pool, _timed, _chat, session_id, q.query)
+    timings["total"] = time.perf_counter() - t0
+    return {**out, "timings": timings}
+
+@app.post("/chat/{session_id}/stream")
+async def chat_stream(session_id: str, q: Query):
+    """Server-sent events: `token`s, then `done` with the session's sources."""
+    s = sessions.get(session_id)
+
+    async def events():
+        try:
+            async for piece in _iterate_in_thread(generation_pool, assistant.chat_stream, s, q.query):
+                yield _sse("token", {"text": piece})
+        except Exception as exc:
+            yield _sse("error", {"message": str(exc)})
+        yield _sse("done", {"hits": hits_json(s.hits), "session": s.stats()})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.delete("/chat/{session_id}")
+def end_chat(session_id: str):
+    return {"deleted": sessions.drop(session_id)}
+
+@app.get("/metrics")
+def metrics():
+    text = tracing.prometheus_text()
+    if hasattr(assistant.llm, "prometheus_text"):
+        text += assistant.llm.prometheus_text()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Backend admission: in flight, queue depth, waits, coalesced calls (empty when llm.max_in_flight is unset)."""
+    return assistant.llm.stats() if hasattr(assistant.llm, "stats") else {}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return assistant.cache.stats() if assistant.cache else {}
@@ -0,0 +1,85 @@
+# ragassist/session/chat.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..mytypes import RetrievalHit
+from .memory import SessionMemory
+
+
+@dataclass
+class ChatSession:
+    """
+    One conversation: its history and the sources already in its prompt. Follow-ups on
+    the same topic append new sources after the old ones, so the system message of the
+    previous turn stays a prefix of the next one.
+    """
+    memory: SessionMemory
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    hits: List[RetrievalHit] = field(default_factory=list)
+    context: str = ""
+    sources: int = 0             # [Source n] blocks in `context`
+    context_tokens: int = 0
+    topic_emb: Optional[np.ndarray] = None     # embedding of the last question
+    turns: int = 0
+    reused_turns: int = 0        # turns answered by extending the previous context
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def reset_context(self):
+        self.hits, self.context, self.sources, self.context_tokens = [], "", 0, 0
+
+    def extend_context(self, blocks: List[str], tokens: int):
+        if blocks:
+            self.context = "\n\n".join(([self.context] if self.context else []) + blocks)
+            self.sources += len(blocks)
+            self.context_tokens += tokens
+
+    def stats(self) -> Dict:
+        return {"id": self.id, "turns": self.turns, "reused_turns": self.reused_turns, "sources": self.sources,
+                "context_tokens": self.context_tokens, "history_tokens": self.memory.tokens()}
+
+
+class SessionStore:
+    """In-process sessions by ID; idle ones expire after ttl_s, the least recently used go past max_sessions."""
+    def __init__(self, factory, ttl_s: float = 1800, max_sessions: int = 256):
+        self.factory = factory          # () -> ChatSession
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_cfg(cls, cfg: Dict, factory):
+        c = cfg.get("chat", {})
+        return cls(factory, ttl_s=c.get("session_ttl_s", 1800), max_sessions=c.get("max_sessions", 256))
+
+    def get(self, session_id: Optional[str] = None) -> ChatSession:
+        """The session with this ID, or a new one (under that ID, if given)."""
+        now = time.monotonic()
+        with self._lock:
+            for sid in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl_s]:
+                del self._sessions[sid]
+            s = self._sessions.get(session_id) if session_id else None
+            if s is None:
+                s = self.factory()
+                if session_id:
+                    s.id = session_id
+                self._sessions[s.id] = s
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(s.id)
+            s.last_used = now
+            return s
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
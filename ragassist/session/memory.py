@@ -1,12 +1,32 @@
 from collections import deque
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class SessionMemory:
-    def __init__(self, max_turns: int = 20):
+    def __init__(self, max_turns: int = 20, max_tokens: Optional[int] = None, counter=None):
         self.buf = deque(maxlen=max_turns)
+        self.max_tokens = max_tokens
+        self.counter = counter          # TokenCounter; required with max_tokens
+        self._tokens = deque(maxlen=max_turns)
 
     def add(self, role: str, content: str):
         self.buf.append({"role": role, "content": content})
+        self._tokens.append(self.counter.count(content) if self.counter else 0)
+        if self.max_tokens is not None and sum(self._tokens) > self.max_tokens:
+            # trim well below the limit: every trim changes the prompt prefix the LLM
+            # server may have cached, so do it rarely rather than on every turn
+            while self.buf and sum(self._tokens) > self.max_tokens * 0.6:
+                self.buf.popleft()
+                self._tokens.popleft()
+            # never start the history with an assistant reply
+            while self.buf and self.buf[0]["role"] != "user":
+                self.buf.popleft()
+                self._tokens.popleft()
+
+    def tokens(self) -> int:
+        return sum(self._tokens)
+
+    def messages(self) -> List[Dict]:
+        return list(self.buf)
 
     def window(self, n: int = 6) -> List[Dict]:
         return list(self.buf)[-n:]
@@ -0,0 +1,124 @@
+# ragassist/tracing.py
+"""
+Minimal tracing: named spans feed process-wide latency histograms (exported in the
+Prometheus text format) and, inside `collect()`, a per-request breakdown. While
+tracing is disabled and no collector is active a span is a shared no-op context
+manager, so instrumented code pays one flag check and one ContextVar lookup.
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = False
+_lock = threading.Lock()
+_hist: Dict[str, list] = {}          # span -> [bucket counts..., +Inf count, sum]
+_collector: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("ragassist_trace", default=None)
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class _Span:
+    __slots__ = ("name", "sink", "t0")
+
+    def __init__(self, name: str, sink: Optional[Dict[str, float]]):
+        self.name, self.sink = name, sink
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.t0, self.sink)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoSpan()
+
+
+def span(name: str):
+    sink = _collector.get()
+    if not _enabled and sink is None:
+        return _NOOP
+    return _Span(name, sink)
+
+
+def traced(name: str):
+    """Decorator form of span() for functions and methods."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled and _collector.get() is None:
+                return fn(*args, **kwargs)
+            with _Span(name, _collector.get()):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def record(name: str, seconds: float, sink: Optional[Dict[str, float]] = None):
+    with _lock:
+        if sink is not None:
+            sink[name] = sink.get(name, 0.0) + seconds
+        if _enabled:
+            h = _hist.get(name)
+            if h is None:
+                h = _hist[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+            h[bisect.bisect_left(BUCKETS, seconds)] += 1
+            h[-1] += seconds
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """Per-request timings: span name -> total seconds for spans in this context."""
+    sink: Dict[str, float] = {}
+    token = _collector.set(sink)
+    try:
+        yield sink
+    finally:
+        _collector.reset(token)
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        out = {}
+        for name, h in sorted(_hist.items()):
+            n = sum(h[:-1])
+            out[name] = {"count": n, "total_s": h[-1], "mean_ms": 1000.0 * h[-1] / n if n else 0.0}
+        return out
+
+
+def prometheus_text() -> str:
+    lines = ["# HELP ragassist_span_seconds Time spent in instrumented stages.",
+             "# TYPE ragassist_span_seconds histogram"]
+    with _lock:
+        for name, h in sorted(_hist.items()):
+            cum = 0
+            for le, c in zip(BUCKETS, h):
+                cum += c
+                lines.append(f'ragassist_span_seconds_bucket{{span="{name}",le="{le}"}} {cum}')
+            cum += h[len(BUCKETS)]
+            lines.append(f'ragassist_span_seconds_bucket{{span="{name}",le="+Inf"}} {cum}')
+            lines.append(f'ragassist_span_seconds_sum{{span="{name}"}} {h[-1]}')
+            lines.append(f'ragassist_span_seconds_count{{span="{name}"}} {cum}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,33 @@
+"""Shared setup for tests that ingest a small corpus with the in-process stores."""
+from pathlib import Path
+
+import yaml
+
+from ragassist.bench import HashEmbedder
+from ragassist.index.store_factory import get_bm25_store, get_chunk_store, get_vector_store
+from ragassist.ingestion.chunker import Chunker
+from ragassist.ingestion.dedup import ChunkDeduper
+from ragassist.ingestion.file_loader import FileLoader
+from ragassist.ingestion.manifest import IngestManifest, settings_fingerprint
+from ragassist.ingestion.pipeline import IngestPipeline
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def make_cfg(tmp_path):
+    cfg = yaml.safe_load((ROOT / "configs" / "default.yaml").read_text())
+    cfg["project"].update(root_dir=str(tmp_path / "corpus"), index_dir=str(tmp_path / "index"))
+    cfg["vector_store"]["provider"] = "numpy"
+    cfg["bm25"]["provider"] = "native"
+    return cfg
+
+
+def ingest(cfg, files=None):
+    """Run one ingest; returns the pipeline, the indexed chunks by ID and the BM25 store."""
+    manifest = IngestManifest(cfg["project"]["index_dir"], settings_fingerprint(cfg))
+    vec, bm25, docs = get_vector_store(cfg), get_bm25_store(cfg), get_chunk_store(cfg)
+    pipe = IngestPipeline(Chunker(cfg), lambda: HashEmbedder(64), vec, bm25, docs, manifest,
+                          deduper=ChunkDeduper.from_cfg(cfg))
+    pipe.run(FileLoader.from_cfg(cfg).load_files() if files is None else files)
+    ids = list(dict.fromkeys(cid for e in manifest.files.values() for cid in e["chunk_ids"]))
+    return pipe, docs.get_many(ids), bm25
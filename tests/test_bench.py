@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import yaml
+
+from ragassist.bench import run_bench
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_bench_small_corpus(tmp_path):
+    cfg = yaml.safe_load((ROOT / "configs" / "default.yaml").read_text())
+    cfg["vector_store"]["provider"] = "numpy"
+    cfg["bm25"]["provider"] = "native"
+    report = run_bench(cfg, n_text=20, n_code=10, n_queries=20, k=5, pdf_dir=None, dim=64, work_dir=str(tmp_path))
+    assert report["ingest"]["errors"] == []
+    assert report["ingest"]["chunks"] > 0
+    assert report["ingest"]["stages"]["write"]["items"] == report["ingest"]["chunks"]
+    # both stores search exhaustively; only tied scores may order differently from the exact reference
+    assert report["recall"]["dense"] >= 0.95
+    assert report["recall"]["bm25"] >= 0.95
+    assert report["query"]["retrieve"]["p50_ms"] > 0
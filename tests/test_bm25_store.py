@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("whoosh")
+
+from ragassist.index.bm25_store import BM25Store
+from ragassist.mytypes import Chunk
+
+
+def _chunks(n, word):
+    return [Chunk(id=f"{word}{i}", text=f"{word} number {i}", file_path=f"{word}.md", position=i, type="md", meta={})
+            for i in range(n)]
+
+
+def _writers(store, monkeypatch):
+    procs = []
+    writer = store.ix.writer
+
+    def spy(**kw):
+        procs.append(kw.get("procs", 1))
+        return writer(**kw)
+
+    monkeypatch.setattr(store.ix, "writer", spy)
+    return procs
+
+
+def test_small_bulk_uses_one_process(tmp_path, monkeypatch):
+    store = BM25Store(str(tmp_path), procs=2, procs_min_docs=5)
+    store.add(_chunks(3, "alpha"))
+    procs = _writers(store, monkeypatch)
+    with store.bulk():
+        store.delete(["alpha0"])
+        store.add(_chunks(2, "beta"))
+    assert procs == [1]
+    assert {h["id"] for h in store.search("alpha", k=10)} == {"alpha1", "alpha2"}
+
+
+def test_large_bulk_switches_to_procs(tmp_path, monkeypatch):
+    store = BM25Store(str(tmp_path), procs=2, procs_min_docs=5)
+    store.add(_chunks(3, "beta"))
+    procs = _writers(store, monkeypatch)
+    with store.bulk():
+        store.delete(["beta0"])
+        store.add(_chunks(4, "gamma"))
+        store.add(_chunks(2, "delta"))
+    assert procs == [2]
+    assert {h["id"] for h in store.search("beta", k=10)} == {"beta1", "beta2"}
+    assert len(store.search("gamma OR delta", k=10)) == 6
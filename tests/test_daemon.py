@@ -0,0 +1,10 @@
+from ragassist.daemon import DaemonClient
+
+
+def test_connect_falls_back_on_any_socket_error(tmp_path):
+    assert DaemonClient.connect(str(tmp_path / "missing.sock")) is None
+    stale = tmp_path / "stale.sock"
+    stale.write_text("")
+    assert DaemonClient.connect(str(stale)) is None
+    # index dirs deep enough to exceed the AF_UNIX path limit
+    assert DaemonClient.connect(str(tmp_path / ("x" * 200) / "daemon.sock")) is None
@@ -0,0 +1,36 @@
+import os
+
+from helpers import ingest as _ingest, make_cfg as _cfg
+
+
+def test_edited_chunk_replaces_its_old_version(tmp_path):
+    cfg = _cfg(tmp_path)
+    body = " ".join(f"word{i}" for i in range(150))
+    path = tmp_path / "corpus" / "notes.txt"
+    path.parent.mkdir()
+    path.write_text(body[:600] + " The deadline is MONDAY " + body[600:])
+    _ingest(cfg)
+
+    path.write_text(body[:600] + " The deadline is FRIDAY " + body[600:])
+    os.utime(path, (1, 1))
+    pipe, chunks, bm25 = _ingest(cfg)
+    texts = " ".join(c.text for c in chunks.values())
+    assert "FRIDAY" in texts and "MONDAY" not in texts
+    assert pipe.duplicates["near"] == 0
+    assert bm25.search("friday", k=3)
+
+
+def test_copies_share_one_canonical_chunk(tmp_path):
+    cfg = _cfg(tmp_path)
+    text = " ".join(f"term{i}" for i in range(300))
+    for d in ("a", "b"):
+        (tmp_path / "corpus" / d).mkdir(parents=True)
+        (tmp_path / "corpus" / d / "copy.txt").write_text(text)
+    pipe, chunks, _ = _ingest(cfg)
+    assert pipe.duplicates["exact"] > 0
+    assert all(len(c.meta.get("also_in", [])) == 1 for c in chunks.values())
+
+    os.remove(tmp_path / "corpus" / "a" / "copy.txt")
+    _, chunks, _ = _ingest(cfg)
+    assert chunks and all(c.file_path.endswith(os.path.join("b", "copy.txt")) and not c.meta.get("also_in")
+                          for c in chunks.values())
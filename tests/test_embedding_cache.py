@@ -0,0 +1,35 @@
+import multiprocessing as mp
+
+import numpy as np
+
+from ragassist.ingestion.embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def _vec(text):
+    return np.full(DIM, float(sum(map(ord, text))), dtype=np.float32)
+
+
+def _fill(cache_dir, prefix, n):
+    cache = EmbeddingCache(cache_dir, "m", DIM)
+    for i in range(0, n, 10):
+        texts = [f"{prefix} {j}" for j in range(i, i + 10)]
+        cache.put_many(texts, np.stack([_vec(t) for t in texts]))
+
+
+def test_processes_sharing_a_cache_get_distinct_rows(tmp_path):
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_fill, args=(str(tmp_path), p, 200)) for p in ("left", "right")]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+    cache = EmbeddingCache(str(tmp_path), "m", DIM)
+    rows = [r for (r,) in cache._db.execute("SELECT row FROM entries")]
+    assert len(rows) == len(set(rows)) == 400
+    texts = [f"{p} {j}" for p in ("left", "right") for j in range(200)]
+    got, missing = cache.get_many(texts)
+    assert missing == []
+    assert np.array_equal(got, np.stack([_vec(t) for t in texts]))
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+BUDGET_S = 1.0
+HEAVY = ("torch", "sentence_transformers", "chromadb", "whoosh", "fitz", "pymupdf4llm", "fastapi", "ollama", "openai")
+
+
+def _cold_import():
+    code = ("import sys, time; t = time.perf_counter(); import ragassist.cli; took = time.perf_counter() - t; "
+            f"print(took, *[m for m in {HEAVY!r} if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    took, *heavy = out.stdout.split()
+    return float(took), heavy
+
+
+def test_cli_import_within_budget():
+    # best of three, so one slow start on a busy machine does not fail the suite
+    runs = [_cold_import() for _ in range(3)]
+    assert all(not heavy for _, heavy in runs), runs[0][1]
+    assert min(took for took, _ in runs) <= BUDGET_S
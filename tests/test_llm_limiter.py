@@ -0,0 +1,74 @@
+import threading
+import time
+
+from ragassist.generation.llm_base import LLMBase
+from ragassist.generation.llm_limiter import LimitedLLM
+from ragassist.mytypes import LLMResponse
+
+
+class GatedLLM(LLMBase):
+    """Backend whose calls block until released, recording how many ran at once."""
+    model = "gated"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def answer(self, system_prompt, retrievals, task, max_tokens, temperature, history=None) -> LLMResponse:
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(10)
+        with self._lock:
+            self.running -= 1
+        return LLMResponse(answer=task, citations=[], confidence=1.0, mode="answer")
+
+
+def _until(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+def _ask(llm, task, out):
+    return threading.Thread(target=lambda: out.append(llm.answer("sys", "ctx", task, 16, 0.0)))
+
+
+def test_in_flight_never_exceeds_limit():
+    inner = GatedLLM()
+    llm = LimitedLLM(inner, max_in_flight=3)
+    out = []
+    threads = [_ask(llm, f"q{i}", out) for i in range(10)]
+    for t in threads:
+        t.start()
+    _until(lambda: llm.stats()["queue_depth"] == 7 and inner.running == 3)
+    assert llm.stats()["in_flight"] == 3
+    inner.release.set()
+    for t in threads:
+        t.join()
+    assert inner.peak == 3 and inner.calls == 10
+    assert sorted(r.answer for r in out) == sorted(f"q{i}" for i in range(10))
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_identical_prompts_share_one_call():
+    inner = GatedLLM()
+    llm = LimitedLLM(inner, max_in_flight=2)
+    out = []
+    leader = _ask(llm, "same", out)
+    leader.start()
+    _until(lambda: inner.running == 1)
+    followers = [_ask(llm, "same", out) for _ in range(5)]
+    for t in followers:
+        t.start()
+    _until(lambda: llm.counts["coalesced"] == 5)
+    inner.release.set()
+    for t in [leader] + followers:
+        t.join()
+    assert inner.calls == 1
+    assert len(out) == 6 and all(r.answer == "same" for r in out)
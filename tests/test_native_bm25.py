@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+from ragassist.index import lexical_store
+from ragassist.index.lexical_store import NativeBM25Store
+from ragassist.mytypes import Chunk
+
+
+def _chunk(cid, text):
+    return Chunk(id=cid, text=text, type="text", file_path="f.txt", position=0, meta={})
+
+
+def test_search_during_bulk_ignores_buffered_terms(tmp_path):
+    store = NativeBM25Store(str(tmp_path))
+    store.add([_chunk("a", "alpha beta")])
+    with store.bulk():
+        store.add([_chunk("b", "gamma delta")])
+        assert store.search("gamma") == []
+        assert [h["id"] for h in store.search("alpha")] == ["a"]
+    assert [h["id"] for h in store.search("gamma")] == ["b"]
+
+
+def test_reopen_sees_last_saved_generation(tmp_path):
+    store = NativeBM25Store(str(tmp_path))
+    store.add([_chunk("a", "alpha beta")])
+    store.delete(["a"])
+    store.add([_chunk("c", "alpha zeta")])
+    reopened = NativeBM25Store(str(tmp_path))
+    assert [h["id"] for h in reopened.search("alpha")] == ["c"]
+    assert (tmp_path / "bm25_native" / "CURRENT").exists()
+    assert len(list((tmp_path / "bm25_native").glob("gen-*"))) <= 2
+
+
+def test_scoring_runs_outside_the_lock(tmp_path, monkeypatch):
+    store = NativeBM25Store(str(tmp_path))
+    store.add([_chunk("a", "alpha beta"), _chunk("b", "beta gamma")])
+    free = []
+
+    def log1p(x):
+        t = threading.Thread(target=lambda: free.append(store._lock.acquire(timeout=1) and (store._lock.release() or True)))
+        t.start()
+        t.join()
+        return np.log1p(x)
+
+    class _Numpy:
+        def __getattr__(self, name):
+            return log1p if name == "log1p" else getattr(np, name)
+
+    monkeypatch.setattr(lexical_store, "np", _Numpy())
+    assert [h["id"] for h in store.search("alpha")] == ["a"]
+    assert free == [True]
+
+
+def test_delete_leaves_a_taken_snapshot_alone(tmp_path):
+    store = NativeBM25Store(str(tmp_path))
+    store.add([_chunk("a", "alpha")] + [_chunk(f"b{i}", "beta") for i in range(4)])
+    alive = store.alive
+    store.delete(["a"])     # few enough dead docs that nothing is compacted
+    assert alive.all() and store.alive.tolist() == [False] + [True] * 4
+    assert store.search("alpha") == []
@@ -0,0 +1,45 @@
+import threading
+
+import numpy as np
+
+from ragassist.index.numpy_store import NumpyVectorStore
+from ragassist.mytypes import Chunk
+
+
+def _store(tmp_path, n=10):
+    store = NumpyVectorStore("t", str(tmp_path))
+    chunks = [Chunk(id=f"c{i}", text="", type="txt", file_path="f", position=i, meta={}) for i in range(n)]
+    store.add(chunks, np.eye(n, dtype=np.float32))
+    return store
+
+
+def _lock_free(lock) -> bool:
+    got = []
+    t = threading.Thread(target=lambda: got.append(lock.acquire(timeout=1) and (lock.release() or True)))
+    t.start()
+    t.join()
+    return got == [True]
+
+
+def test_scoring_runs_outside_the_lock(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    scores, free = store._scores, []
+    monkeypatch.setattr(store, "_scores", lambda *a: free.append(_lock_free(store._lock)) or scores(*a))
+    assert store.query(np.eye(10, dtype=np.float32)[3], k=1)["ids"] == [["c3"]]
+    assert free == [True]
+
+
+def test_query_retries_when_rows_move(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    store.delete([f"c{i}" for i in range(5)])
+    scores, calls = store._scores, []
+
+    def compact_meanwhile(*a):
+        calls.append(1)
+        if len(calls) == 1:
+            store.compact()         # c7 moves from row 7 to row 2
+        return scores(*a)
+
+    monkeypatch.setattr(store, "_scores", compact_meanwhile)
+    assert store.query(np.eye(10, dtype=np.float32)[7], k=1)["ids"] == [["c7"]]
+    assert len(calls) == 2
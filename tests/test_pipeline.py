@@ -0,0 +1,47 @@
+import os
+import uuid
+
+from helpers import ingest, make_cfg
+from ragassist.bench import HashEmbedder
+from ragassist.cli import _ingest_parts
+from ragassist.index.store_factory import get_bm25_store, get_vector_store
+from ragassist.ingestion.file_loader import FileLoader
+from ragassist.ingestion.manifest import IngestManifest, settings_fingerprint
+from ragassist.mytypes import Chunk
+
+
+def test_file_vanishing_after_discovery_is_dropped(tmp_path):
+    cfg = make_cfg(tmp_path)
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name in ("keep", "gone"):
+        (corpus / f"{name}.txt").write_text(f"{name} " + " ".join(f"w{i}" for i in range(50)))
+    ingest(cfg)
+
+    (corpus / "gone.txt").write_text("edited, so its hash is read again")
+    files = list(FileLoader.from_cfg(cfg).load_files())
+    os.remove(corpus / "gone.txt")
+    pipe, chunks, bm25 = ingest(cfg, files)
+    assert [e.split(":")[0] for e in pipe.errors] == [str(corpus / "gone.txt")]
+    manifest = IngestManifest(cfg["project"]["index_dir"], settings_fingerprint(cfg))
+    assert list(manifest.files) == [str(corpus / "keep.txt")]
+    assert chunks and not bm25.search("gone", k=3)
+
+
+def test_index_without_manifest_is_rebuilt(tmp_path):
+    cfg = make_cfg(tmp_path)
+    (tmp_path / "corpus").mkdir()
+    (tmp_path / "corpus" / "a.txt").write_text("current text about apples")
+    # an index written before manifests existed: chunks under random IDs that no manifest lists
+    legacy = [Chunk(id=uuid.uuid4().hex, text="legacy text about apples", type="txt", file_path="a.txt",
+                    position=0, meta={})]
+    get_vector_store(cfg).add(legacy, HashEmbedder(64).encode([legacy[0].text]))
+    get_bm25_store(cfg).add(legacy)
+
+    manifest, vec, bm25, docs, *_ = _ingest_parts(cfg)
+    assert manifest.usable
+    assert not vec.query(HashEmbedder(64).encode(["apples"]), k=5)["ids"][0]
+    assert not bm25.search("legacy", k=5)
+    _, chunks, bm25 = ingest(cfg)
+    assert [c.text for c in chunks.values()] == ["current text about apples"]
+    assert [h["id"] for h in bm25.search("apples", k=5)] == list(chunks)
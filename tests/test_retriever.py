@@ -0,0 +1,37 @@
+from ragassist.bench import HashEmbedder
+from ragassist.index.chunk_store import ChunkStore
+from ragassist.index.lexical_store import NativeBM25Store
+from ragassist.index.numpy_store import NumpyVectorStore
+from ragassist.mytypes import Chunk
+from ragassist.retrieval.retriever import Retriever
+
+EMB = HashEmbedder(64)
+
+
+def _chunk(cid, text):
+    return Chunk(id=cid, text=text, type="txt", file_path=f"{cid}.txt", position=0, meta={})
+
+
+def _retriever(tmp_path, dense, lexical, stored):
+    vec, bm25, docs = NumpyVectorStore("t", str(tmp_path)), NativeBM25Store(str(tmp_path)), ChunkStore(str(tmp_path))
+    vec.add(dense, EMB.encode([c.text for c in dense]))
+    bm25.add(lexical)
+    docs.put(stored)
+    return Retriever(vec, bm25, docs, embed_model="stub", encoder=EMB)
+
+
+def test_bm25_only_hit_is_hydrated(tmp_path):
+    dense = [_chunk("d", "unrelated words entirely")]
+    lexical = [_chunk("b", "the zanzibar protocol handshake")]
+    r = _retriever(tmp_path, dense, lexical, dense + lexical)
+    hits = {h.chunk.id: h for h in r.retrieve("zanzibar handshake", k=2)}
+    assert hits["b"].chunk.text == "the zanzibar protocol handshake"
+
+
+def test_missing_chunks_do_not_shrink_the_top_k(tmp_path):
+    # the best dense matches were never written to the docstore (e.g. left over from an old index)
+    orphans = [_chunk(f"o{i}", "apple banana cherry") for i in range(3)]
+    kept = [_chunk(f"k{i}", f"apple banana extra{i}") for i in range(5)]
+    r = _retriever(tmp_path, orphans + kept, [], kept)
+    hits = r.retrieve("apple banana cherry", k=3)
+    assert len(hits) == 3 and all(h.chunk.id.startswith("k") for h in hits)
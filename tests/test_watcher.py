@@ -0,0 +1,19 @@
+import os
+
+from ragassist.ingestion.file_loader import FileLoader
+from ragassist.ingestion.watcher import Watcher
+
+
+def test_directory_events_expand_to_files(tmp_path):
+    (tmp_path / "new" / "sub").mkdir(parents=True)
+    (tmp_path / "new" / "a.md").write_text("a")
+    (tmp_path / "new" / "sub" / "b.py").write_text("b")
+    (tmp_path / "kept.md").write_text("k")
+    w = Watcher(FileLoader(str(tmp_path), [".md", ".py"], [], "p"))
+    root = str(w.loader.root)
+    known = [os.path.join(root, "old", "a.md"), os.path.join(root, "old", "sub", "b.py"),
+             os.path.join(root, "older.md"), os.path.join(root, "kept.md")]
+    # "old" was renamed to "new": its indexed files are dropped, the moved ones picked up
+    got = w.expand([os.path.join(root, "old"), os.path.join(root, "new"), os.path.join(root, "kept.md")], known)
+    assert got == sorted(known[:2] + [os.path.join(root, "new", "a.md"), os.path.join(root, "new", "sub", "b.py"),
+                                      os.path.join(root, "kept.md")])